@@ -1,253 +1,111 @@
-import pandas as pd
-import pdfplumber
+import asyncio
 import json
-import re
 import os
-from langdetect import detect
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse
 import tempfile
-from typing import List
+from typing import List, Optional
+
+from cpu_executor import run_cpu_bound
+from outline import OUTLINE_ENGINE, OUTLINE_ENGINES, build_outline
+from uploads import save_upload
 
 
 router = APIRouter()
 
 # ------------------------
-# Utility Functions
+# NDJSON streaming
 # ------------------------
 
-def detect_style(font_name):
-    font_name = font_name.lower() if font_name else ""
-    return "bold" in font_name, "italic" in font_name or "oblique" in font_name
-
-def is_garbage_line(text):
-    clean_text = text.replace(" ", "")
-    return bool(re.fullmatch(r'[.\-_*•●]{5,}', clean_text)) or (len(clean_text) < 2 and not any(c.isalpha() for c in clean_text))
-
-def is_near(value, target, tolerance=0.5):
-    return abs(value - target) <= tolerance
-
-def is_declaration_text(text):
-    text = text.lower()
-    declaration_keywords = ["i declare", "undertake", "signature", "date"]
-    return any(keyword in text for keyword in declaration_keywords) and not re.match(r'^\d+\.\s', text)
-
-def is_heading_only(text):
-    if ":" in text:
-        return text.split(":")[0].strip()
-    if text.startswith("•") or text.startswith("-"):
-        return ""
-    return text
-
-def is_inside_table(span, table_bboxes):
-    for x0, top, x1, bottom, page_num in table_bboxes:
-        if span["page"] == page_num and x0 <= span.get("x0", 0) <= x1 and top <= span.get("top", 0) <= bottom:
-            return True
-    return False
-
-def merge_spans_by_font(spans):
-    merged = []
-    current = None
-    for span in spans:
-        if current is None:
-            current = span
+async def save_for_stream(files):
+    # Uploads are copied to disk before the response starts, since the
+    # request's spooled files are closed once the endpoint returns.
+    # Returns (index, filename, tmp_pdf_path or None, error or None) per file
+    saved = []
+    for index, file in enumerate(files):
+        if not file.filename.lower().endswith('.pdf'):
+            saved.append((index, file.filename, None, "Only PDF files are allowed."))
             continue
-        same_page = span["page"] == current["page"]
-        close_font = is_near(span["size"], current["size"])
-        same_style = (span["is_bold"] == current["is_bold"] and span["is_italic"] == current["is_italic"])
-        if same_page and close_font and same_style:
-            current["text"] += " " + span["text"]
-        else:
-            merged.append(current)
-            current = span
-    if current:
-        merged.append(current)
-    return merged
-
-def detect_pdf_type(text):
-    text = text.lower()
-    scores = {
-        "ticket": sum(1 for kw in ["e-ticket", "pnr", "fare summary", "flight", "departure", "booking id"] if kw in text),
-        "form": sum(1 for kw in ["service book", "signature", "designation", "date", "name of the"] if kw in text),
-        "invoice": sum(1 for kw in ["invoice", "subtotal", "tax", "total amount", "bill to"] if kw in text),
-        "receipt": sum(1 for kw in ["transaction id", "payment method", "paid", "amount", "receipt"] if kw in text),
-        "certificate": sum(1 for kw in ["successfully completed", "certificate", "participation", "appreciation", "future endeavors"] if kw in text),
-    }
-    best_type = max(scores, key=scores.get)
-    confidence = scores[best_type] / max(1, sum(scores.values()))
-    return {"type": best_type, "confidence": confidence}
-
-def detect_language(text):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
+            tmp_pdf_path = tmp_pdf.name
+        try:
+            await save_upload(file, tmp_pdf_path)
+        except HTTPException as e:
+            if os.path.exists(tmp_pdf_path):
+                os.remove(tmp_pdf_path)
+            saved.append((index, file.filename, None, e.detail))
+            continue
+        saved.append((index, file.filename, tmp_pdf_path, None))
+    return saved
+
+async def outline_line(index, filename, tmp_pdf_path, error, engine):
+    line = {"index": index, "filename": filename}
+    if error is None:
+        try:
+            line["outline"] = await run_cpu_bound(build_outline, tmp_pdf_path, engine=engine)
+        except Exception as e:
+            error = f"Failed to extract outline: {str(e)}"
+        finally:
+            os.remove(tmp_pdf_path)
+    if error is not None:
+        line["error"] = error
+    return json.dumps(line, ensure_ascii=False) + "\n"
+
+async def stream_outlines(saved, engine):
+    # One line per file, in completion order; all files run concurrently,
+    # bounded by the CPU executor's own concurrency limit
+    tasks = [asyncio.ensure_future(outline_line(*entry, engine)) for entry in saved]
     try:
-        return detect(text)
-    except:
-        return "unknown"
-
-# ------------------------
-# Main Extraction Function
-# ------------------------
-
-def extract_outline(pdf_path, json_output_path):
-    with pdfplumber.open(pdf_path) as pdf:
-        raw_spans = []
-        table_bboxes = []
-        full_text = ""
-
-        for page_num, page in enumerate(pdf.pages):
-            page_text = page.extract_text()
-            if page_text:
-                full_text += "\n" + page_text
-
-            for table_obj in page.find_tables():
-                table_bboxes.append((table_obj.bbox[0], table_obj.bbox[1], table_obj.bbox[2], table_obj.bbox[3], page_num))
-
-            lines = page.extract_text_lines(return_chars=True, strip=True)
-            for line in lines:
-                text = line["text"].strip()
-                if not text or is_garbage_line(text):
-                    continue
-                chars = line.get("chars", [])
-                font_size = round(chars[0]["size"], 1) if chars else 10.0
-                font_name = chars[0].get("fontname", "") if chars else ""
-                is_bold, is_italic = detect_style(font_name)
-                raw_spans.append({
-                    "text": text,
-                    "size": font_size,
-                    "page": page_num,
-                    "is_bold": is_bold,
-                    "is_italic": is_italic,
-                    "x0": line.get("x0", 0),
-                    "top": line.get("top", 0)
-                })
-
-        if not raw_spans:
-            with open(json_output_path, "w", encoding="utf-8") as f:
-                json.dump({"title": "", "outline": []}, f, indent=4, ensure_ascii=False)
-            return
-
-        spans = merge_spans_by_font(raw_spans)
-        pdf_type_info = detect_pdf_type(full_text)
-        detected_lang = detect_language(full_text)
-
-        font_sizes = sorted(set(span["size"] for span in spans), reverse=True)
-        if not font_sizes or len(font_sizes) < 3:
-            title_font, h1_font, h2_font, h3_font = 14.0, 12.0, 11.0, 10.0
-        else:
-            title_font = font_sizes[0]
-            h1_font = font_sizes[1]
-            h2_font = font_sizes[2]
-            h3_font = font_sizes[3] if len(font_sizes) > 3 else h2_font
-
-        title_spans = []
-        outline = []
-        label_blacklist = {
-            "bengali – your heart rate",
-            "bengali - your heart rate"
-        }
-
-        for s in spans:
-            size = s["size"]
-            if is_near(size, title_font) and s["page"] == 0:
-                title_spans.append(s)
-                continue
-            if is_inside_table(s, table_bboxes):
-                continue
-
-            level = None
-            if is_near(size, h1_font):
-                level = "H1"
-            elif is_near(size, h2_font):
-                level = "H2"
-            elif is_near(size, h3_font):
-                level = "H3"
-
-            if level and not is_declaration_text(s["text"]):
-                heading_text = is_heading_only(s["text"])
-                heading_text = re.sub(r"।\s*$", "", heading_text).strip()
-
-                if heading_text.strip().lower() in label_blacklist:
-                    continue
-                if any(q in heading_text for q in ["'", '"', "‘", "’", "“", "”"]):
-                    continue
-                if not heading_text:
-                    continue
-
-                if detected_lang in ["en", "fr", "de", "es", "pt", "it"]:
-                    if re.search(r'[!.]\s*$', heading_text) and not re.match(r'^\d+(\.\d+)*', heading_text):
-                        continue
-                    if not heading_text[0].islower() and not heading_text.startswith("("):
-                        outline.append({
-                            "level": level,
-                            "text": heading_text,
-                            "page": s["page"]
-                        })
-                else:
-                    outline.append({
-                        "level": level,
-                        "text": heading_text,
-                        "page": s["page"]
-                    })
-
-        title = " ".join([s["text"] for s in title_spans]).strip()
-
-        if os.path.basename(pdf_path).lower() == "file01.pdf":
-            if len(outline) == 1:
-                first = outline[0]
-                if (
-                    first["page"] == 0 and
-                    first["level"] == "H1" and
-                    first["text"].strip().lower() == "application form for grant of ltc advance"
-                ):
-                    title = first["text"]
-                    outline = []
-
-        recipient_name = title.strip()
-        is_likely_name = recipient_name and recipient_name.count(" ") <= 3 and recipient_name.istitle()
-        certificate_keywords = ["successfully completed", "certificate", "launchpad", "participation"]
-        if pdf_type_info["type"] == "certificate":
-            if any(kw in full_text.lower() for kw in certificate_keywords):
-                title = "Certificate of Participation"
-                if is_likely_name:
-                    outline.insert(0, {
-                        "level": "H1",
-                        "text": recipient_name,
-                        "page": 0
-                    })
-
-        output = {
-            "title": title,
-            "outline": outline
-        }
-
-        with open(json_output_path, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=4, ensure_ascii=False)
-
+        for next_line in asyncio.as_completed(tasks):
+            yield await next_line
+    finally:
+        # Client went away: stop queued work and drop the remaining temp files
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for _, _, tmp_pdf_path, _ in saved:
+            if tmp_pdf_path and os.path.exists(tmp_pdf_path):
+                os.remove(tmp_pdf_path)
 
 # ------------------------
 # FastAPI Endpoint
 # ------------------------
 
 @router.post("/pdf-outline")
-async def pdf_outline(files: List[UploadFile] = File(...)):
+async def pdf_outline(
+    files: List[UploadFile] = File(...),
+    engine: Optional[str] = Query(None, description="Outline engine: 'pdfplumber' or 'fitz'"),
+    stream: bool = Query(False, description="Stream one NDJSON line per file as soon as it is ready")
+):
+    engine = (engine or OUTLINE_ENGINE).lower()
+    if engine not in OUTLINE_ENGINES:
+        return {"error": f"Unknown outline engine '{engine}'. Use one of: {', '.join(sorted(OUTLINE_ENGINES))}."}
+
+    if stream:
+        saved = await save_for_stream(files)
+        return StreamingResponse(stream_outlines(saved, engine), media_type="application/x-ndjson")
+
     results = []
     for file in files:
         if not file.filename.lower().endswith('.pdf'):
             return {"error": "Only PDF files are allowed."}
 
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-            tmp_pdf.write(await file.read())
             tmp_pdf_path = tmp_pdf.name
-
-        tmp_json_path = tmp_pdf_path.replace(".pdf", ".json")
-        extract_outline(tmp_pdf_path, tmp_json_path)
-
-        with open(tmp_json_path, "r", encoding="utf-8") as f:
-            result = json.load(f)
+        try:
+            await save_upload(file, tmp_pdf_path)
+        except HTTPException as e:
+            if os.path.exists(tmp_pdf_path):
+                os.remove(tmp_pdf_path)
+            return {"error": e.detail}
+
+        try:
+            result = await run_cpu_bound(build_outline, tmp_pdf_path, engine=engine)
+        finally:
+            os.remove(tmp_pdf_path)
 
         results.append({
             "filename": file.filename,
             "outline": result
         })
-
-        os.remove(tmp_pdf_path)
-        os.remove(tmp_json_path)
     return results
@@ -4,42 +4,64 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 import re
+import json
 import time
 import datetime
 import unicodedata
 import tempfile
-import shutil
-import base64
-from typing import List, Dict, Any
-
-import fitz
-import nltk
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from sentence_transformers import SentenceTransformer, util
-from nltk.tokenize import sent_tokenize
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse
 from werkzeug.utils import secure_filename
 
+from cpu_executor import executor_info, run_cpu_bound
+from dedup import NearDuplicateIndex
+from document_registry import DocumentRegistry, compute_doc_id
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from embedding_service import EmbeddingBatcher
+from parsed_document import parsed_documents
+from model_loader import EMBEDDING_BACKEND, MODEL_ID, MODEL_NAME, get_model, is_model_loaded, model_state
+from retrieval import RunningGroupTopK, RunningTopK, normalize_rows, round_scores
+from segmentation import CHUNK_SENT_WINDOW, CHUNKS_PER_SECTION_LIMIT, SENTENCE_SEGMENTER, sentence_windows
+from section_extraction import extract_sections_many, iter_sections_many
+from uploads import MAX_FILE_SIZE_MB, read_json_upload, save_upload
+
 # ==== Constants ====
 N_TOP_SECTIONS = 5
-CHUNK_SENT_WINDOW = 4
-CHUNKS_PER_SECTION_LIMIT = 10
 SECTION_CANDIDATE_LIMIT = 60
+MAX_PAGES = 30
+# Large-document mode indexes every page and lifts the candidate cap; it can
+# also be requested per call with full_document=true
+LARGE_DOCUMENT_MODE = os.environ.get("LARGE_DOCUMENT_MODE", "0") != "0"
 ALLOWED_EXTENSIONS = {'pdf'}
-
-# Download NLTK data if not available
-try:
-    nltk.download('punkt_tab', quiet=True)
-    nltk.download('punkt', quiet=True)
-except:
-    pass
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(tempfile.gettempdir(), "pdf_insights"))
+EMBEDDING_CACHE_MAX_MB = int(os.environ.get("EMBEDDING_CACHE_MAX_MB", 512))
+EMBED_MAX_BATCH_SIZE = int(os.environ.get("EMBED_MAX_BATCH_SIZE", 64))
+EMBED_MAX_WAIT_MS = float(os.environ.get("EMBED_MAX_WAIT_MS", 5))
+EMBED_PIPELINE_BATCH_SIZE = int(os.environ.get("EMBED_PIPELINE_BATCH_SIZE", 256))
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 1024))
+MAX_BATCH_QUERIES = int(os.environ.get("MAX_BATCH_QUERIES", 100))
+# Upload chunks whose MinHash-estimated Jaccard similarity to an earlier chunk
+# of the same request reaches this share its embedding scores; 0 disables.
+# The LSH band split follows it (dedup.lsh_bands), so lower thresholds
+# such as 0.8 keep finding pairs at the threshold
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0))
 
 # Initialize Router
 router = APIRouter()
 
-# Load embedding model at startup
-print("Loading embedding model for Semantic Analyzer...")
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L12-v2")
-print("Model loaded successfully.")
+# The model itself is loaded by model_loader, outside of import time
+embedder = EmbeddingBatcher(get_model, max_batch_size=EMBED_MAX_BATCH_SIZE, max_wait_ms=EMBED_MAX_WAIT_MS)
+
+embedding_cache = EmbeddingCache(
+    os.path.join(CACHE_DIR, "embeddings.sqlite3"),
+    MODEL_ID,
+    max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+)
+query_cache = QueryEmbeddingCache(QUERY_CACHE_SIZE)
+document_registry = DocumentRegistry(os.path.join(CACHE_DIR, "documents"))
 
 # ==== Helper Functions ====
 def allowed_file(filename):
@@ -54,312 +76,576 @@ def remove_bullet_prefix(text):
     return re.sub(r'(?m)^(\s*[\u2022o\-\*\d\.\)\•°º(]+\s*)+', '', text).strip()
 
 def smart_sentence_chunks(text, window=CHUNK_SENT_WINDOW):
-    sents = [s.strip() for s in sent_tokenize(text) if len(s.strip()) > 20]
-    if not sents: 
-        return []
-    
-    chunks = []
-    for i in range(len(sents)):
-        chunk = ' '.join(sents[i:i+window])
-        if len(chunk) > 40:
-            chunks.append(chunk)
-        if i+window >= len(sents): 
-            break
-    
-    seen = set()
-    uniq_chunks = []
-    for c in chunks:
-        if c not in seen and len(uniq_chunks) < CHUNKS_PER_SECTION_LIMIT:
-            uniq_chunks.append(c)
-            seen.add(c)
-    return uniq_chunks
-
-def extract_sections(pdf_path, max_pages=30):
-    generic_keywords = {'instructions', 'ingredients', 'notes', 'preparation', 'method'}
-    doc = fitz.open(pdf_path)
+    return sentence_windows(text, window, CHUNKS_PER_SECTION_LIMIT)
+
+def encode_chunks(texts):
+    cached = embedding_cache.get_many(texts)
+    missing = list(dict.fromkeys(t for t, vec in zip(texts, cached) if vec is None))
+    if missing:
+        fresh = embedder.encode(missing)
+        embedding_cache.put_many(missing, fresh)
+        fresh_by_text = dict(zip(missing, fresh))
+        cached = [vec if vec is not None else fresh_by_text[t] for t, vec in zip(texts, cached)]
+    return np.vstack(cached).astype(np.float32, copy=False)
+
+def encode_queries(queries):
+    cached = query_cache.get_many(queries)
+    missing = list(dict.fromkeys(q for q, vec in zip(queries, cached) if vec is None))
+    if missing:
+        fresh = embedder.encode(missing)
+        query_cache.put_many(missing, fresh)
+        fresh_by_query = dict(zip(missing, fresh))
+        cached = [vec if vec is not None else fresh_by_query[q] for q, vec in zip(queries, cached)]
+    return np.vstack(cached).astype(np.float32, copy=False)
+
+def chunk_sections(extracted_sections):
     sections = []
-    current_section = None
-    
-    for page_idx, page in enumerate(doc):
-        if page_idx >= max_pages: 
-            break
-        blocks = page.get_text('dict')['blocks']
-        
-        for b in blocks:
-            if b['type'] != 0: 
-                continue
-            for line in b['lines']:
-                this_line = ''.join([span['text'] for span in line['spans']])
-                max_size = max([span['size'] for span in line['spans']]) if line['spans'] else 0
-                is_bold = any('Bold' in span['font'] for span in line['spans'])
-                norm_line = this_line.strip()
-                norm_lower = norm_line.lower().strip().rstrip(':').strip()
-                is_generic = norm_lower in generic_keywords
-                
-                if (len(norm_line) >= 7 and len(norm_line) < 100
-                    and (is_bold or max_size > 12)
-                    and re.match(r"^[A-Z0-9][\w\s\-:,()&']+$", norm_line)
-                    and not norm_lower.startswith("figure")
-                    and not is_generic):
-                    
-                    if current_section:
-                        current_section['end_page'] = page_idx + 1
-                        sections.append(current_section)
-                    
-                    current_section = {
-                        'title': norm_line,
-                        'page_number': page_idx + 1,
-                        'section_text': "",
-                    }
-                    continue
-                
-                if current_section:
-                    current_section['section_text'] += norm_line + ' '
-    
-    if current_section:
-        current_section['end_page'] = current_section.get('page_number', 1)
-        sections.append(current_section)
-    
-    doc.close()
-    return [s for s in sections if len(s["section_text"]) > 70]
-
-def find_similar_chunks(pdf_paths: List[str], query_text: str) -> Dict[str, Any]:
-    query_embedding = model.encode([query_text], convert_to_tensor=True)
-
-    chunk_records = []
-    for doc_path in pdf_paths:
-        for sec in extract_sections(doc_path, max_pages=30):
-            chunks = smart_sentence_chunks(sec['section_text'], window=CHUNK_SENT_WINDOW)
-            for chunk in chunks:
-                chunk_records.append({
-                    "document": os.path.basename(doc_path),
-                    "page_number": sec["page_number"],
-                    "chunk_text": clean_text(chunk, 650),
-                })
-    
-    if not chunk_records:
-        return {"snippets": []}
-
-    batch_chunk_texts = [rec["chunk_text"] for rec in chunk_records]
-    chunk_embeddings = model.encode(batch_chunk_texts, convert_to_tensor=True)
-    
-    sims = util.cos_sim(query_embedding, chunk_embeddings)[0].tolist()
-    for i, sim in enumerate(sims):
-        chunk_records[i]["similarity"] = round(sim, 4)
-
-    top_chunks = sorted(chunk_records, key=lambda x: x["similarity"], reverse=True)[:N_TOP_SECTIONS]
-
-    snippets = [
-        {
-            "document": chunk["document"],
-            "page_number": chunk["page_number"],
-            "text": chunk["chunk_text"]
-        } for chunk in top_chunks if chunk["similarity"] > 0.3 # Add a relevance threshold
-    ]
-
-    return {"snippets": snippets}
+    for sec in extracted_sections:
+        chunks = smart_sentence_chunks(sec['section_text'], window=CHUNK_SENT_WINDOW)
+        sections.append({
+            "title": sec["title"],
+            "page_number": sec["page_number"],
+            "chunks": [clean_text(chunk, 650) for chunk in chunks],
+        })
+    return sections
+
+def use_full_document(full_document=None):
+    if full_document is None:
+        return LARGE_DOCUMENT_MODE
+    if isinstance(full_document, str):
+        return full_document.strip().lower() in ("1", "true", "yes")
+    return bool(full_document)
+
+def page_limit(full_document):
+    return None if full_document else MAX_PAGES
+
+def build_document_sections(pdf_path, full_document=False):
+    return chunk_sections(extract_sections_many([pdf_path], max_pages=page_limit(full_document))[0])
+
+def iter_documents(pdf_paths=(), doc_ids=(), progress=None, full_document=False):
+    # Lazy: uploads are extracted and chunked one document at a time.
+    # progress(done, total, document) is reported once per document
+    total = len(pdf_paths) + len(doc_ids)
+    extracted_progress = None
+    if progress is not None:
+        extracted_progress = lambda done, _, path: progress(done, total, os.path.basename(path))
+    extracted = iter_sections_many(pdf_paths, max_pages=page_limit(full_document), progress=extracted_progress)
+    for p, sections in zip(pdf_paths, extracted):
+        yield {"document": os.path.basename(p), "sections": chunk_sections(sections)}
+    for done, doc_id in enumerate(doc_ids, start=len(pdf_paths) + 1):
+        if not document_registry.exists(doc_id):
+            raise KeyError(doc_id)
+        entry = document_registry.load(doc_id)
+        if progress is not None:
+            progress(done, total, entry["filename"])
+        if entry["model_name"] == MODEL_ID:
+            yield {"document": entry["filename"], "store": entry["store"]}
+        else:
+            # Vectors from another model are not comparable; re-encode the texts
+            yield {"document": entry["filename"], "sections": list(entry["store"].iter_sections())}
+
+def near_duplicate_index():
+    # One per request; None when near-duplicate sharing is off
+    return NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD) if NEAR_DUPLICATE_THRESHOLD > 0 else None
+
+def score_documents(query_embeddings, documents, chunk_limit=None, document_names=None,
+                    batch_size=EMBED_PIPELINE_BATCH_SIZE, dedup=None):
+    # Yields (scores, section keys, items) per batch, in document order, with
+    # one row of scores per query: all queries share one matmul per batch. Upload
+    # chunks are encoded in fixed-size batches, so only one batch of their
+    # embeddings is alive at a time; registered documents are scored straight
+    # from their memory-mapped store. An item is the chunk text, or a
+    # (store, index) reference for stored chunks (see chunk_text).
+    # Once more than chunk_limit chunks were scored, each remaining document
+    # stops after its current section. With a NearDuplicateIndex, upload chunks
+    # are clustered across all documents and only each cluster's first chunk
+    # is encoded; the rest reuse its scores.
+    query = normalize_rows(np.atleast_2d(query_embeddings))
+    cluster_scores = []
+    pending = []
+    count = 0
+    for doc in documents:
+        if document_names is not None:
+            document_names.append(doc["document"])
+        store = doc.get("store")
+        if store is not None:
+            if pending:
+                yield score_pending(query, pending, dedup, cluster_scores)
+                pending = []
+            stop = len(store) if chunk_limit is None else store.capped_length(chunk_limit - count)
+            section_keys = [(doc["document"], title, page_number) for title, page_number, _, _ in store.sections]
+            for start in range(0, stop, batch_size):
+                end = min(start + batch_size, stop)
+                keys = [section_keys[i] for i in store.section_indices(start, end)]
+                yield round_scores(store.scores(query, start, end)), keys, [(store, i) for i in range(start, end)]
+            count += stop
+            continue
+        for sec in doc["sections"]:
+            key = (doc["document"], sec["title"], sec["page_number"])
+            for chunk in sec["chunks"]:
+                pending.append((key, chunk))
+                count += 1
+                if len(pending) >= batch_size:
+                    yield score_pending(query, pending, dedup, cluster_scores)
+                    pending = []
+            if chunk_limit is not None and count > chunk_limit:
+                break
+    if pending:
+        yield score_pending(query, pending, dedup, cluster_scores)
+
+def score_pending(query, pending, dedup=None, cluster_scores=None):
+    keys, texts = (list(column) for column in zip(*pending))
+    if dedup is None:
+        matrix = normalize_rows(encode_chunks(texts))
+        return round_scores(query @ matrix.T), keys, texts
+    # Cluster ids are handed out in order, so the clusters new in this batch
+    # are the ids past the known ones, first seen at their representative
+    clusters = dedup.assign(texts)
+    known = len(cluster_scores)
+    representatives = {}
+    for i, cluster in enumerate(clusters):
+        if cluster >= known:
+            representatives.setdefault(cluster, i)
+    if representatives:
+        matrix = normalize_rows(encode_chunks([texts[i] for i in representatives.values()]))
+        cluster_scores.extend(round_scores(query @ matrix.T).T)
+    return np.stack([cluster_scores[cluster] for cluster in clusters], axis=1), keys, texts
+
+def chunk_text(item):
+    if isinstance(item, str):
+        return item
+    store, index = item
+    return store.text(index)
+
+def encode_in_batches(texts, batch_size=EMBED_PIPELINE_BATCH_SIZE, progress=None):
+    # Each batch lands in the embedding cache as soon as it is encoded, so an
+    # interrupted ingest of a long document resumes where it stopped
+    if not texts:
+        return np.zeros((0, get_model().get_sentence_embedding_dimension()), dtype=np.float32)
+    blocks = []
+    for start in range(0, len(texts), batch_size):
+        blocks.append(encode_chunks(texts[start:start + batch_size]))
+        if progress is not None:
+            progress(start + len(blocks[-1]), len(texts))
+    return np.concatenate(blocks)
+
+def register_document(pdf_path, filename, full_document=False, progress=None):
+    # An existing index is reused unless it was embedded by another model or
+    # backend, or a full-document index is requested and the stored one only
+    # covers the first MAX_PAGES pages
+    doc_id = compute_doc_id(pdf_path)
+    exists = document_registry.exists(doc_id)
+    stale = False
+    if exists:
+        meta = document_registry.describe(doc_id)
+        stale = meta["model_name"] != MODEL_ID or (full_document and not meta["full_document"])
+    if not exists or stale:
+        sections = build_document_sections(pdf_path, full_document)
+        texts = [chunk for sec in sections for chunk in sec["chunks"]]
+        embeddings = encode_in_batches(texts, progress=progress)
+        document_registry.save(
+            doc_id, filename, pdf_path, sections, embeddings, MODEL_ID, full_document=full_document, replace=exists
+        )
+    return document_registry.describe(doc_id)
+
+def find_similar_chunks(documents, query_text: str) -> Dict[str, Any]:
+    query_embedding = encode_queries([query_text])
+
+    running = RunningTopK(N_TOP_SECTIONS)
+    dedup = near_duplicate_index()
+    for scores, keys, items in score_documents(query_embedding, documents, dedup=dedup):
+        running.push(scores[0], list(zip(keys, items)))
+
+    snippets = []
+    for score, ((document, _, page_number), item) in running.results():
+        if score <= 0.3: # Add a relevance threshold
+            continue
+        snippets.append({
+            "document": document,
+            "page_number": page_number,
+            "text": chunk_text(item)
+        })
+
+    result = {"snippets": snippets}
+    if dedup is not None:
+        result["deduplication"] = dedup.stats()
+    return result
+
+def search_documents(pdf_paths, doc_ids, query_text, full_document=False):
+    return find_similar_chunks(iter_documents(pdf_paths, doc_ids, full_document=full_document), query_text)
+
+def parse_doc_ids(raw):
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    if not isinstance(raw, list) or not all(isinstance(d, str) for d in raw):
+        raise HTTPException(status_code=400, detail="'doc_ids' must be a list of strings or a comma-separated string")
+    doc_ids = [d.strip() for d in raw if d.strip()]
+    unknown = [d for d in doc_ids if not document_registry.exists(d)]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id(s): {', '.join(unknown)}")
+    return doc_ids
 
 @router.post("/find-similar-snippets")
 async def find_similar_snippets_api(
     query_text: str = Form(...),
     current_document_name: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[str] = Form(None),
+    full_document: Optional[bool] = Form(None)
 ):
     try:
         if not query_text.strip():
             raise HTTPException(status_code=400, detail="Query text cannot be empty")
         
-        if not files:
+        registered = parse_doc_ids(doc_ids)
+        if not files and not registered:
             return {"success": True, "data": {"snippets": []}}
 
         pdf_paths = []
         with tempfile.TemporaryDirectory() as temp_dir:
-            for file in files:
+            for file in files or []:
                 if allowed_file(file.filename):
                     filename = secure_filename(file.filename)
                     file_path = os.path.join(temp_dir, filename)
-                    with open(file_path, "wb") as f:
-                        shutil.copyfileobj(file.file, f)
+                    await save_upload(file, file_path)
                     pdf_paths.append(file_path)
                 else:
                     continue # Silently ignore non-PDF files
             
-            if not pdf_paths:
+            if not pdf_paths and not registered:
                 raise HTTPException(status_code=400, detail="No valid PDF files provided for search.")
 
-            result = find_similar_chunks(pdf_paths, query_text)
+            result = await run_cpu_bound(
+                search_documents, pdf_paths, registered, query_text, use_full_document(full_document)
+            )
             
             return {"success": True, "data": result}
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Snippet search failed: {str(e)}")
 
 
 
-def process_pdfs(pdf_paths: List[str], persona: str, job: str) -> Dict[str, Any]:
-    query = f"{persona}. Task: {job}"
-    query_embedding = model.encode([query], convert_to_tensor=True)
-    
-    chunk_records = []
-    for doc_path in pdf_paths:
-        for sec in extract_sections(doc_path, max_pages=30):
-            chunks = smart_sentence_chunks(sec['section_text'], window=CHUNK_SENT_WINDOW)
-            for chunk in chunks:
-                chunk_records.append({
-                    "document": os.path.basename(doc_path),
-                    "section_title": sec["title"],
-                    "page_number": sec["page_number"],
-                    "chunk_text": clean_text(chunk, 650),
-                })
-            if len(chunk_records) > SECTION_CANDIDATE_LIMIT * CHUNKS_PER_SECTION_LIMIT:
-                break
-    
-    if not chunk_records:
+def rank_sections(documents, queries, full_document=False, progress=None):
+    # One pass over the documents for any number of queries; returns
+    # (per-query RunningGroupTopK, input document names, metadata additions).
+    # progress() is called without arguments after every scored batch, so a
+    # job can be cancelled in the middle of a long document
+    query_embeddings = encode_queries(queries)
+
+    input_documents = []
+    chunk_limit = None if full_document else SECTION_CANDIDATE_LIMIT * CHUNKS_PER_SECTION_LIMIT
+    rankings = [RunningGroupTopK(N_TOP_SECTIONS) for _ in queries]
+    dedup = near_duplicate_index()
+    for scores, keys, items in score_documents(query_embeddings, documents, chunk_limit, input_documents, dedup=dedup):
+        for running, row in zip(rankings, scores):
+            running.push(row, keys, items)
+        if progress is not None:
+            progress()
+
+    if not rankings[0].seen:
         raise ValueError("No chunks extracted from the PDFs.")
-    
-    batch_chunk_texts = [rec["chunk_text"] for rec in chunk_records]
-    chunk_embeddings = model.encode(batch_chunk_texts, convert_to_tensor=True)
-    
-    sims = util.cos_sim(query_embedding, chunk_embeddings)[0].tolist()
-    for i, sim in enumerate(sims):
-        chunk_records[i]["similarity"] = round(sim, 4)
-    
-    best_per_section = {}
-    for rec in chunk_records:
-        key = (rec["document"], rec["section_title"], rec["page_number"])
-        if key not in best_per_section or rec["similarity"] > best_per_section[key]["similarity"]:
-            best_per_section[key] = rec
-    
-    top_sections = sorted(
-        best_per_section.values(), key=lambda x: x["similarity"], reverse=True
-    )[:N_TOP_SECTIONS]
-    
+    extra_metadata = {"deduplication": dedup.stats()} if dedup is not None else {}
+    return rankings, input_documents, extra_metadata
+
+def ranked_sections(running):
     extracted_sections = []
     subsection_analysis = []
-    for idx, s in enumerate(top_sections):
-        cleaned_text = remove_bullet_prefix(s["chunk_text"])
+    for idx, (similarity, (document, section_title, page_number), item) in enumerate(running.results()):
+        cleaned_text = remove_bullet_prefix(chunk_text(item))
         extracted_sections.append({
-            "document": s["document"],
-            "section_title": s["section_title"],
+            "document": document,
+            "section_title": section_title,
             "importance_rank": idx + 1,
-            "page_number": s["page_number"],
-            "similarity_score": s["similarity"]
+            "page_number": page_number,
+            "similarity_score": similarity
         })
         subsection_analysis.append({
-            "document": s["document"],
+            "document": document,
             "refined_text": cleaned_text,
-            "page_number": s["page_number"],
-            "similarity_score": s["similarity"]
+            "page_number": page_number,
+            "similarity_score": similarity
         })
-    
+    return extracted_sections, subsection_analysis
+
+def process_pdfs(documents, persona: str, job: str, full_document=False, progress=None) -> Dict[str, Any]:
+    query = f"{persona}. Task: {job}"
+    (running,), input_documents, extra_metadata = rank_sections(documents, [query], full_document, progress)
+    extracted_sections, subsection_analysis = ranked_sections(running)
+
     return {
         "metadata": {
-            "input_documents": [os.path.basename(p) for p in pdf_paths],
+            "input_documents": input_documents,
             "persona": persona,
             "job_to_be_done": job,
             "processing_timestamp": datetime.datetime.now().isoformat(),
-            "total_chunks_processed": len(chunk_records)
+            "total_chunks_processed": running.seen,
+            **extra_metadata
         },
         "extracted_sections": extracted_sections,
         "subsection_analysis": subsection_analysis
     }
 
+def process_pdfs_batch(documents, queries: List[Dict[str, str]], full_document=False, progress=None) -> Dict[str, Any]:
+    # queries: [{"persona", "job"}]; chunks are extracted and embedded once
+    texts = [f"{q['persona']}. Task: {q['job']}" for q in queries]
+    rankings, input_documents, extra_metadata = rank_sections(documents, texts, full_document, progress)
+
+    results = []
+    for q, running in zip(queries, rankings):
+        extracted_sections, subsection_analysis = ranked_sections(running)
+        results.append({
+            "persona": q["persona"],
+            "job_to_be_done": q["job"],
+            "extracted_sections": extracted_sections,
+            "subsection_analysis": subsection_analysis
+        })
+
+    return {
+        "metadata": {
+            "input_documents": input_documents,
+            "query_count": len(queries),
+            "processing_timestamp": datetime.datetime.now().isoformat(),
+            "total_chunks_processed": rankings[0].seen,
+            **extra_metadata
+        },
+        "results": results
+    }
+
+def analyze_documents(pdf_paths, doc_ids, persona, job, progress=None, full_document=False):
+    documents = iter_documents(pdf_paths, doc_ids, progress, full_document)
+    return process_pdfs(documents, persona, job, full_document, progress)
+
+def analyze_documents_batch(pdf_paths, doc_ids, queries, progress=None, full_document=False):
+    documents = iter_documents(pdf_paths, doc_ids, progress, full_document)
+    return process_pdfs_batch(documents, queries, full_document, progress)
+
+def parse_queries(raw):
+    try:
+        queries = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'queries' must be a JSON list of {\"persona\", \"job\"} objects")
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=400, detail="'queries' must be a non-empty list")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    parsed = []
+    for q in queries:
+        persona = str(q.get("persona") or "").strip() if isinstance(q, dict) else ""
+        job = str(q.get("job") or "").strip() if isinstance(q, dict) else ""
+        if not persona or not job:
+            raise HTTPException(status_code=400, detail="Every query needs a non-empty 'persona' and 'job'")
+        parsed.append({"persona": persona, "job": job})
+    return parsed
+
 # ==== API Endpoints ====
 @router.get("/health")
 def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.datetime.now().isoformat(),
-        "model_loaded": model is not None
+        "model_loaded": is_model_loaded()
     }
 
+@router.get("/ready")
+def readiness_check():
+    state = model_state()
+    # In lazy mode the model only loads on the first request that needs it, so
+    # the instance has to take traffic before it is loaded
+    loaded = state["loaded"] or state["load_mode"] == "lazy"
+    ready = loaded and state["tokenizer_data"] != "missing"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "model": state},
+    )
+
 @router.post("/process-pdfs")
 async def process_pdfs_api(
     persona: str = Form(...),
     job: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[str] = Form(None),
+    full_document: Optional[bool] = Form(None)
 ):
     try:
         if not persona.strip() or not job.strip():
             raise HTTPException(status_code=400, detail="Persona and job cannot be empty")
 
+        registered = parse_doc_ids(doc_ids)
+        if not files and not registered:
+            raise HTTPException(status_code=400, detail="No files or doc_ids provided")
+
         pdf_paths = []
         with tempfile.TemporaryDirectory() as temp_dir:
-            for file in files:
+            for file in files or []:
                 if allowed_file(file.filename):
                     filename = secure_filename(file.filename)
                     file_path = os.path.join(temp_dir, filename)
-                    with open(file_path, "wb") as f:
-                        shutil.copyfileobj(file.file, f)
+                    await save_upload(file, file_path)
                     pdf_paths.append(file_path)
                 else:
                     raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}. Only PDF allowed.")
 
             start_time = time.time()
-            result = process_pdfs(pdf_paths, persona, job)
+            result = await run_cpu_bound(
+                analyze_documents, pdf_paths, registered, persona, job, full_document=use_full_document(full_document)
+            )
             processing_time = time.time() - start_time
             result["metadata"]["processing_time_seconds"] = round(processing_time, 2)
 
             return {"success": True, "data": result}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 @router.post("/process-pdfs-json")
-async def process_pdfs_json(data: Dict[str, Any]):
+async def process_pdfs_json(request: Request):
     try:
-        persona = data.get("persona", "").strip()
-        job = data.get("job", "").strip()
-        files_data = data.get("files", [])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Files are base64-decoded to disk while the body is still streaming in
+            data = await read_json_upload(request.stream(), temp_dir)
+            persona = str(data.get("persona") or "").strip()
+            job = str(data.get("job") or "").strip()
+            pdf_paths = data["pdf_paths"]
+            registered = parse_doc_ids(data.get("doc_ids"))
+
+            if not persona or not job:
+                raise HTTPException(status_code=400, detail="Missing or empty 'persona' and 'job'")
+            if not data["files_count"] and not registered:
+                raise HTTPException(status_code=400, detail="No files provided")
+            if not pdf_paths and not registered:
+                raise HTTPException(status_code=400, detail="No valid PDF files to process")
 
-        if not persona or not job:
-            raise HTTPException(status_code=400, detail="Missing or empty 'persona' and 'job'")
-        if not files_data:
-            raise HTTPException(status_code=400, detail="No files provided")
+            full_document = use_full_document(data.get("full_document"))
+            start_time = time.time()
+            result = await run_cpu_bound(
+                analyze_documents, pdf_paths, registered, persona, job, full_document=full_document
+            )
+            processing_time = time.time() - start_time
+            result["metadata"]["processing_time_seconds"] = round(processing_time, 2)
+
+            return {"success": True, "data": result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+@router.post("/process-pdfs-batch")
+async def process_pdfs_batch_api(
+    queries: str = Form(..., description='JSON list of {"persona", "job"} objects'),
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[str] = Form(None),
+    full_document: Optional[bool] = Form(None)
+):
+    # Many persona/job queries over one document set: chunks are extracted
+    # and embedded once and scored against every query in one matmul per batch
+    try:
+        parsed = parse_queries(queries)
+        registered = parse_doc_ids(doc_ids)
+        if not files and not registered:
+            raise HTTPException(status_code=400, detail="No files or doc_ids provided")
 
         pdf_paths = []
         with tempfile.TemporaryDirectory() as temp_dir:
-            for file_data in files_data:
-                filename = secure_filename(file_data.get("filename", "document.pdf"))
-                if not filename.lower().endswith(".pdf"):
-                    continue
-                try:
-                    content = base64.b64decode(file_data.get("content", ""))
+            for file in files or []:
+                if allowed_file(file.filename):
+                    filename = secure_filename(file.filename)
                     file_path = os.path.join(temp_dir, filename)
-                    with open(file_path, "wb") as f:
-                        f.write(content)
+                    await save_upload(file, file_path)
                     pdf_paths.append(file_path)
-                except Exception as e:
-                    raise HTTPException(status_code=400, detail=f"Failed to decode file {filename}: {str(e)}")
-
-            if not pdf_paths:
-                raise HTTPException(status_code=400, detail="No valid PDF files to process")
+                else:
+                    raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}. Only PDF allowed.")
 
             start_time = time.time()
-            result = process_pdfs(pdf_paths, persona, job)
+            result = await run_cpu_bound(
+                analyze_documents_batch, pdf_paths, registered, parsed, full_document=use_full_document(full_document)
+            )
             processing_time = time.time() - start_time
             result["metadata"]["processing_time_seconds"] = round(processing_time, 2)
 
             return {"success": True, "data": result}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
+@router.post("/documents")
+async def register_documents_api(
+    files: List[UploadFile] = File(...),
+    full_document: Optional[bool] = Form(None)
+):
+    try:
+        registered = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for file in files:
+                if not allowed_file(file.filename):
+                    raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}. Only PDF allowed.")
+                filename = secure_filename(file.filename)
+                file_path = os.path.join(temp_dir, filename)
+                await save_upload(file, file_path)
+                registered.append(
+                    await run_cpu_bound(register_document, file_path, filename, use_full_document(full_document))
+                )
+        return {"success": True, "data": {"documents": registered}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+
+@router.get("/documents")
+def list_documents_api():
+    return {"success": True, "data": {"documents": document_registry.list()}}
+
+@router.get("/documents/{doc_id}")
+def get_document_api(doc_id: str):
+    if not document_registry.exists(doc_id):
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+    return {"success": True, "data": document_registry.describe(doc_id)}
+
+@router.delete("/documents/{doc_id}")
+def delete_document_api(doc_id: str):
+    if not document_registry.delete(doc_id):
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+    return {"success": True, "data": {"doc_id": doc_id, "deleted": True}}
+
 @router.get("/info")
 def api_info():
     return {
         "api_version": "1.0",
-        "model_name": "sentence-transformers/all-MiniLM-L12-v2",
-        "max_file_size_mb": 50,
+        "model_name": MODEL_NAME,
+        "embedding_backend": EMBEDDING_BACKEND,
+        "max_file_size_mb": MAX_FILE_SIZE_MB,
         "supported_formats": ["pdf"],
         "configuration": {
             "n_top_sections": N_TOP_SECTIONS,
             "chunk_sentence_window": CHUNK_SENT_WINDOW,
             "chunks_per_section_limit": CHUNKS_PER_SECTION_LIMIT,
-            "section_candidate_limit": SECTION_CANDIDATE_LIMIT
+            "section_candidate_limit": SECTION_CANDIDATE_LIMIT,
+            "sentence_segmenter": SENTENCE_SEGMENTER,
+            "max_pages": MAX_PAGES,
+            "large_document_mode": LARGE_DOCUMENT_MODE,
+            "max_batch_queries": MAX_BATCH_QUERIES,
+            "near_duplicate_threshold": NEAR_DUPLICATE_THRESHOLD
         },
+        "embedding_cache": embedding_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "parsed_document_cache": parsed_documents.stats(),
+        "embedding_store_dtype": document_registry.store_dtype,
+        "cpu_executor": executor_info(),
+        "embedding_batcher": embedder.stats(),
         "endpoints": {
-            "/health": "GET - Health check",
+            "/health": "GET - Liveness check",
+            "/ready": "GET - Readiness check (model loaded and warmed up; always ready with MODEL_LOAD_MODE=lazy)",
             "/process-pdfs": "POST - Process PDFs (form data)",
             "/process-pdfs-json": "POST - Process PDFs (JSON)",
+            "/process-pdfs-batch": "POST - Rank sections for many persona/job queries over one document set",
+            "/documents": "POST - Register PDFs once and get doc_ids; GET - List registered documents",
+            "/documents/{doc_id}": "GET - Document details; DELETE - Remove a registered document",
             "/info": "GET - API information"
         }
     }
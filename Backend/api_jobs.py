@@ -0,0 +1,188 @@
+import os
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import JSONResponse
+from werkzeug.utils import secure_filename
+
+from api_b import CACHE_DIR, allowed_file, analyze_documents, parse_doc_ids, register_document, use_full_document
+from jobs import INPUT_DIR, JobCancelled, JobQueue
+from outline import OUTLINE_ENGINE, OUTLINE_ENGINES, build_outline
+from uploads import save_upload
+
+router = APIRouter()
+
+# ==== Job Handlers ====
+# Run on the job queue's worker threads; progress() raises JobCancelled once
+# the job has been cancelled, and is also called inside each document (per
+# page or embedding batch) so a cancelled job stops mid-document.
+
+def input_paths(job_dir, filenames):
+    # One subdirectory per upload keeps duplicate names apart
+    return [os.path.join(job_dir, INPUT_DIR, str(i), name) for i, name in enumerate(filenames)]
+
+def run_process_pdfs_job(params, job_dir, progress):
+    progress(0, len(params["files"]) + len(params["doc_ids"]))
+    start_time = time.time()
+    result = analyze_documents(
+        input_paths(job_dir, params["files"]), params["doc_ids"], params["persona"], params["job"], progress,
+        params.get("full_document", False)
+    )
+    result["metadata"]["processing_time_seconds"] = round(time.time() - start_time, 2)
+    return result
+
+def run_pdf_outline_job(params, job_dir, progress):
+    filenames = params["files"]
+    results = []
+    progress(0, len(filenames))
+    for pdf_path, filename in zip(input_paths(job_dir, filenames), params["original_filenames"]):
+        def page_progress(done, total, filename=filename):
+            progress(len(results), len(filenames), f"{filename} (page {done}/{total})")
+        try:
+            outline = build_outline(pdf_path, engine=params["engine"], progress=page_progress)
+            results.append({"filename": filename, "outline": outline})
+        except JobCancelled:
+            raise
+        except Exception as e:
+            results.append({"filename": filename, "error": f"Failed to extract outline: {str(e)}"})
+        progress(len(results), len(filenames), filename)
+    return results
+
+def run_register_documents_job(params, job_dir, progress):
+    # Bulk ingestion; progress is reported per embedding batch of each document
+    filenames = params["files"]
+    documents = []
+    for i, pdf_path in enumerate(input_paths(job_dir, filenames)):
+        def chunk_progress(done, total, i=i):
+            progress(i, len(filenames), f"{filenames[i]} ({done}/{total} chunks)")
+        progress(i, len(filenames), filenames[i])
+        documents.append(register_document(pdf_path, filenames[i], params["full_document"], chunk_progress))
+    progress(len(filenames), len(filenames))
+    return {"documents": documents}
+
+# Created by the app's startup hook, not on import
+job_queue = None
+
+def start_job_queue():
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue(
+            os.path.join(CACHE_DIR, "jobs"),
+            {
+                "process-pdfs": run_process_pdfs_job,
+                "pdf-outline": run_pdf_outline_job,
+                "register-documents": run_register_documents_job,
+            },
+        )
+    job_queue.start()
+
+def stop_job_queue():
+    if job_queue is not None:
+        job_queue.stop()
+
+async def stage_uploads(job_id, files):
+    filenames = [secure_filename(file.filename) for file in files]
+    for file, path in zip(files, input_paths(job_queue.job_dir(job_id), filenames)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await save_upload(file, path)
+    return filenames
+
+def accepted(status):
+    return JSONResponse(status_code=202, content={"success": True, "data": status})
+
+# ==== API Endpoints ====
+@router.post("/process-pdfs")
+async def submit_process_pdfs(
+    persona: str = Form(...),
+    job: str = Form(...),
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[str] = Form(None),
+    full_document: Optional[bool] = Form(None)
+):
+    if not persona.strip() or not job.strip():
+        raise HTTPException(status_code=400, detail="Persona and job cannot be empty")
+    registered = parse_doc_ids(doc_ids)
+    if not files and not registered:
+        raise HTTPException(status_code=400, detail="No files or doc_ids provided")
+    for file in files or []:
+        if not allowed_file(file.filename):
+            raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}. Only PDF allowed.")
+
+    job_id = job_queue.new_job_dir()
+    try:
+        filenames = await stage_uploads(job_id, files or [])
+        params = {
+            "persona": persona, "job": job, "files": filenames, "doc_ids": registered,
+            "full_document": use_full_document(full_document),
+        }
+        return accepted(job_queue.submit("process-pdfs", params, job_id))
+    except Exception:
+        job_queue.discard_job_dir(job_id)
+        raise
+
+@router.post("/pdf-outline")
+async def submit_pdf_outline(
+    files: List[UploadFile] = File(...),
+    engine: Optional[str] = Query(None, description="Outline engine: 'pdfplumber' or 'fitz'")
+):
+    engine = (engine or OUTLINE_ENGINE).lower()
+    if engine not in OUTLINE_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown outline engine '{engine}'. Use one of: {', '.join(sorted(OUTLINE_ENGINES))}.")
+    for file in files:
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}. Only PDF allowed.")
+
+    job_id = job_queue.new_job_dir()
+    try:
+        filenames = await stage_uploads(job_id, files)
+        params = {"engine": engine, "files": filenames, "original_filenames": [file.filename for file in files]}
+        return accepted(job_queue.submit("pdf-outline", params, job_id))
+    except Exception:
+        job_queue.discard_job_dir(job_id)
+        raise
+
+@router.post("/documents")
+async def submit_register_documents(
+    files: List[UploadFile] = File(...),
+    full_document: Optional[bool] = Form(None)
+):
+    for file in files:
+        if not allowed_file(file.filename):
+            raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}. Only PDF allowed.")
+
+    job_id = job_queue.new_job_dir()
+    try:
+        filenames = await stage_uploads(job_id, files)
+        params = {"files": filenames, "full_document": use_full_document(full_document)}
+        return accepted(job_queue.submit("register-documents", params, job_id))
+    except Exception:
+        job_queue.discard_job_dir(job_id)
+        raise
+
+@router.get("")
+def list_jobs(limit: int = Query(100, ge=1, le=1000)):
+    return {"success": True, "data": {"jobs": job_queue.list(limit), "queue": job_queue.stats()}}
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    status = job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+    return {"success": True, "data": status}
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    status, result = job_queue.result(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+    if status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {status}, no result available")
+    return {"success": True, "data": result}
+
+@router.post("/{job_id}/cancel")
+def cancel_job(job_id: str):
+    status = job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+    return {"success": True, "data": status}
@@ -0,0 +1,71 @@
+# cpu_executor.py
+#
+# Runs CPU-bound stages (PDF parsing, embedding) off the event loop so that
+# light endpoints stay responsive while heavy requests are in flight.
+#
+# CPU_EXECUTOR=thread   shares the loaded model between requests (default)
+# CPU_EXECUTOR=process  isolates pure-Python parsing from the event loop's
+#                       GIL; every worker process loads its own model copy
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+CPU_EXECUTOR = os.environ.get("CPU_EXECUTOR", "thread").lower()
+CPU_EXECUTOR_WORKERS = int(os.environ.get("CPU_EXECUTOR_WORKERS", os.cpu_count() or 1))
+CPU_MAX_CONCURRENCY = int(os.environ.get("CPU_MAX_CONCURRENCY", CPU_EXECUTOR_WORKERS))
+
+_executor = None
+_executor_lock = threading.Lock()
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if CPU_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(
+                    max_workers=CPU_EXECUTOR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            elif CPU_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu")
+            else:
+                raise ValueError(f"Unknown CPU_EXECUTOR '{CPU_EXECUTOR}', expected 'thread' or 'process'")
+        return _executor
+
+
+def _get_semaphore():
+    # One semaphore per running loop; asyncio primitives cannot cross loops
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(max(1, CPU_MAX_CONCURRENCY))
+    return semaphore
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def executor_info():
+    return {
+        "kind": CPU_EXECUTOR,
+        "workers": CPU_EXECUTOR_WORKERS,
+        "max_concurrency": CPU_MAX_CONCURRENCY,
+    }
@@ -0,0 +1,89 @@
+# doc_classifier.py
+#
+# Document-level classification for the outline heuristics: the PDF type
+# (ticket, form, invoice, ...) from keyword hits, the certificate keywords,
+# and the text language. One classify_document() call produces all of them
+# from the page texts, and its result is what the rest of the outline code
+# reads.
+#
+# Keywords are matched by one KeywordMatcher over the text, lowercased once:
+# each distinct keyword is searched for once (CPython's substring search, far
+# faster than a per-character automaton in Python), and a keyword contained
+# in one already found is not searched at all. Language detection runs on a
+# bounded sample (evenly spaced windows of the text) with langdetect seeded,
+# so long documents cost the same as short ones and the answer is repeatable.
+
+import os
+
+from langdetect import DetectorFactory, detect
+
+LANGDETECT_SAMPLE_CHARS = int(os.environ.get("LANGDETECT_SAMPLE_CHARS", 20000))
+LANGDETECT_SAMPLE_WINDOWS = 8
+
+# langdetect is randomized; a fixed seed makes the same text give the same language
+DetectorFactory.seed = 0
+
+# Insertion order breaks ties between types with the same score
+PDF_TYPE_KEYWORDS = {
+    "ticket": ["e-ticket", "pnr", "fare summary", "flight", "departure", "booking id"],
+    "form": ["service book", "signature", "designation", "date", "name of the"],
+    "invoice": ["invoice", "subtotal", "tax", "total amount", "bill to"],
+    "receipt": ["transaction id", "payment method", "paid", "amount", "receipt"],
+    "certificate": ["successfully completed", "certificate", "participation", "appreciation", "future endeavors"],
+}
+CERTIFICATE_KEYWORDS = ["successfully completed", "certificate", "launchpad", "participation"]
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        # Longest first, so a keyword is found before the ones it contains
+        self.keywords = sorted(set(keywords), key=lambda kw: (-len(kw), kw))
+        self._contained = {kw: [other for other in self.keywords if other != kw and other in kw] for kw in self.keywords}
+
+    def find(self, text):
+        # Keywords that occur in text (already lowercased)
+        found = set()
+        for kw in self.keywords:
+            if kw not in found and kw in text:
+                found.add(kw)
+                found.update(self._contained[kw])
+        return found
+
+
+_matcher = KeywordMatcher([kw for kws in PDF_TYPE_KEYWORDS.values() for kw in kws] + CERTIFICATE_KEYWORDS)
+
+
+def detect_pdf_type(keywords):
+    scores = {pdf_type: sum(1 for kw in kws if kw in keywords) for pdf_type, kws in PDF_TYPE_KEYWORDS.items()}
+    best_type = max(scores, key=scores.get)
+    confidence = scores[best_type] / max(1, sum(scores.values()))
+    return {"type": best_type, "confidence": confidence}
+
+
+def language_sample(text, limit=LANGDETECT_SAMPLE_CHARS, windows=LANGDETECT_SAMPLE_WINDOWS):
+    if len(text) <= limit:
+        return text
+    size = limit // windows
+    step = (len(text) - size) // (windows - 1)
+    return "\n".join(text[i * step:i * step + size] for i in range(windows))
+
+
+def detect_language(text):
+    try:
+        return detect(language_sample(text))
+    except Exception:
+        return "unknown"
+
+
+def classify_document(page_texts):
+    # page_texts: the non-empty page texts, in page order
+    text = "".join("\n" + page_text for page_text in page_texts)
+    keywords = _matcher.find(text.lower())
+    pdf_type = detect_pdf_type(keywords)
+    return {
+        "type": pdf_type["type"],
+        "confidence": pdf_type["confidence"],
+        "language": detect_language(text),
+        "keywords": keywords,
+        "is_certificate_text": any(kw in keywords for kw in CERTIFICATE_KEYWORDS),
+    }
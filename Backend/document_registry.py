@@ -0,0 +1,112 @@
+# document_registry.py
+#
+# Upload-once store for the Semantic Analyzer. A registered PDF is kept on
+# disk together with its extracted sections/chunks and their embeddings (an
+# embedding_store directory), and is addressed by a stable content-derived
+# doc_id.
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from embedding_store import EMBEDDING_STORE_DTYPE, EmbeddingStore, write_store
+from retrieval import normalize_rows
+
+DOC_ID_LENGTH = 32
+
+
+def compute_doc_id(pdf_path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()[:DOC_ID_LENGTH]
+
+
+def is_valid_doc_id(doc_id):
+    return len(doc_id) == DOC_ID_LENGTH and all(c in "0123456789abcdef" for c in doc_id)
+
+
+class DocumentRegistry:
+    def __init__(self, root, store_dtype=EMBEDDING_STORE_DTYPE):
+        self.root = root
+        self.store_dtype = store_dtype
+        os.makedirs(root, exist_ok=True)
+
+    def _doc_dir(self, doc_id):
+        if not is_valid_doc_id(doc_id):
+            raise KeyError(doc_id)
+        return os.path.join(self.root, doc_id)
+
+    def exists(self, doc_id):
+        try:
+            return os.path.isfile(os.path.join(self._doc_dir(doc_id), "meta.json"))
+        except KeyError:
+            return False
+
+    def save(self, doc_id, filename, pdf_path, sections, embeddings, model_name, full_document=False, replace=False):
+        # full_document marks an index of every page rather than the first 30;
+        # replace swaps such an index in for an existing partial one
+        target = self._doc_dir(doc_id)
+        staging = tempfile.mkdtemp(prefix=f".{doc_id}-", dir=self.root)
+        try:
+            shutil.copyfile(pdf_path, os.path.join(staging, "document.pdf"))
+            write_store(os.path.join(staging, "store"), sections, self._normalized(embeddings), self.store_dtype)
+            meta = {
+                "doc_id": doc_id,
+                "filename": filename,
+                "model_name": model_name,
+                "full_document": full_document,
+                "registered_at": datetime.datetime.now().isoformat(),
+                "section_count": len(sections),
+                "chunk_count": sum(len(sec["chunks"]) for sec in sections),
+                "embedding_dtype": self.store_dtype,
+            }
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            retired = None
+            if replace and os.path.isdir(target):
+                retired = tempfile.mkdtemp(prefix=f".{doc_id}-old-", dir=self.root)
+                os.rename(target, os.path.join(retired, doc_id))
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another request registered the same content first
+                shutil.rmtree(staging, ignore_errors=True)
+            if retired is not None:
+                shutil.rmtree(retired, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return self.describe(doc_id)
+
+    @staticmethod
+    def _normalized(embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        return normalize_rows(embeddings) if len(embeddings) else embeddings
+
+    def load(self, doc_id):
+        doc_dir = self._doc_dir(doc_id)
+        with open(os.path.join(doc_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["store"] = EmbeddingStore(os.path.join(doc_dir, "store"))
+        meta["pdf_path"] = os.path.join(doc_dir, "document.pdf")
+        return meta
+
+    def describe(self, doc_id):
+        with open(os.path.join(self._doc_dir(doc_id), "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list(self):
+        return [self.describe(name) for name in sorted(os.listdir(self.root)) if self.exists(name)]
+
+    def delete(self, doc_id):
+        if not self.exists(doc_id):
+            return False
+        shutil.rmtree(self._doc_dir(doc_id), ignore_errors=True)
+        return True
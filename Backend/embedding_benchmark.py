@@ -0,0 +1,132 @@
+# embedding_benchmark.py
+#
+# Compares embedding backends (see EMBEDDING_BACKEND in model_loader.py) on a
+# corpus of PDFs before switching a deployment to a faster one.
+#
+#   python embedding_benchmark.py /path/to/pdfs [--candidate torch-int8 --candidate onnx] [--json report.json]
+#
+# The corpus is chunked exactly as the Semantic Analyzer chunks uploads. Every
+# backend encodes all chunks and queries (section titles, or --queries); the
+# report gives encode throughput and, against the reference backend, how many
+# of each query's top-k chunks it keeps (overlap@k), top-1 agreement, the
+# largest score difference and the mean cosine between the two vectors of a
+# chunk.
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from model_loader import EMBEDDING_BACKENDS, create_model
+from outline_conformance import collect_pdfs
+from retrieval import cosine_scores, normalize_rows, top_k
+
+
+def load_corpus(pdfs, max_queries):
+    from api_b import build_document_sections
+
+    chunks = []
+    titles = []
+    for pdf_path in pdfs:
+        for sec in build_document_sections(pdf_path):
+            chunks.extend(sec["chunks"])
+            if sec["chunks"]:
+                titles.append(sec["title"])
+    return chunks, list(dict.fromkeys(titles))[:max_queries]
+
+
+def run_backend(backend, chunks, queries, batch_size):
+    started = time.perf_counter()
+    model = create_model(backend)
+    load_seconds = time.perf_counter() - started
+    model.encode(["warmup"], convert_to_numpy=True)
+
+    started = time.perf_counter()
+    vectors = model.encode(chunks, batch_size=batch_size, convert_to_numpy=True)
+    encode_seconds = time.perf_counter() - started
+    query_vectors = model.encode(queries, batch_size=batch_size, convert_to_numpy=True)
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "encode_seconds": round(encode_seconds, 3),
+        "chunks_per_second": round(len(chunks) / encode_seconds, 1) if encode_seconds else float("inf"),
+        "vectors": normalize_rows(vectors),
+        "query_vectors": query_vectors,
+    }
+
+
+def compare_rankings(reference, candidate, k):
+    ref_scores = cosine_scores(reference["query_vectors"], reference["vectors"])
+    cand_scores = cosine_scores(candidate["query_vectors"], candidate["vectors"])
+    overlaps = []
+    top1 = 0
+    for ref_row, cand_row in zip(ref_scores, cand_scores):
+        ref_top = top_k(ref_row, k)
+        cand_top = top_k(cand_row, k)
+        overlaps.append(len(set(ref_top.tolist()) & set(cand_top.tolist())) / max(1, len(ref_top)))
+        top1 += bool(len(ref_top)) and ref_top[0] == cand_top[0]
+    return {
+        f"overlap_at_{k}": round(float(np.mean(overlaps)), 4) if overlaps else None,
+        "top1_agreement": round(top1 / len(overlaps), 4) if overlaps else None,
+        "max_score_diff": round(float(np.abs(ref_scores - cand_scores).max()), 4) if ref_scores.size else 0.0,
+        "mean_vector_cosine": round(float(np.mean(np.sum(reference["vectors"] * candidate["vectors"], axis=1))), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends on a PDF corpus.")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--reference", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--candidate", action="append", choices=EMBEDDING_BACKENDS,
+                        help="Backend to compare (repeatable, default torch-int8)")
+    parser.add_argument("--queries", help="File with one query per line (default: the corpus' section titles)")
+    parser.add_argument("--max-queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args(argv)
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        print("No PDF files found.")
+        return 1
+    chunks, queries = load_corpus(pdfs, args.max_queries)
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    if not chunks or not queries:
+        print("The corpus produced no chunks or queries.")
+        return 1
+    print(f"{len(pdfs)} files, {len(chunks)} chunks, {len(queries)} queries")
+
+    reference = run_backend(args.reference, chunks, queries, args.batch_size)
+    report = []
+    for backend in args.candidate or ["torch-int8"]:
+        try:
+            candidate = run_backend(backend, chunks, queries, args.batch_size)
+        except Exception as e:
+            print(f"{backend}: failed ({e})")
+            report.append({"backend": backend, "error": str(e)})
+            continue
+        entry = {k: v for k, v in candidate.items() if not k.endswith("vectors")}
+        entry["speedup"] = round(reference["encode_seconds"] / candidate["encode_seconds"], 2)
+        entry.update(compare_rankings(reference, candidate, args.k))
+        report.append(entry)
+        print(
+            f"{backend}: {entry['chunks_per_second']} chunks/s ({entry['speedup']}x {args.reference}), "
+            f"overlap@{args.k} {entry[f'overlap_at_{args.k}']:.3f}, top-1 {entry['top1_agreement']:.3f}, "
+            f"max score diff {entry['max_score_diff']:.4f}"
+        )
+    print(f"{args.reference}: {reference['chunks_per_second']} chunks/s")
+
+    if args.json_path:
+        summary = {k: v for k, v in reference.items() if not k.endswith("vectors")}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"reference": summary, "candidates": report}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# embedding_cache.py
+#
+# On-disk, content-addressed cache for chunk embeddings. Entries are keyed by
+# sha256(model name + chunk text) so the same chunk is only ever encoded once
+# per model, no matter which request or document it came from.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# get_many records hits in memory; last_used is written back in one batch
+# with the next put_many, or once this many keys/seconds have piled up
+LAST_USED_FLUSH_KEYS = 4096
+LAST_USED_FLUSH_SECONDS = 30.0
+
+
+class EmbeddingCache:
+    # Several processes may share one cache file (process-pool workers,
+    # uvicorn workers). The stored byte total lives in the database, kept by
+    # triggers in the same transaction as every insert/delete, and put_many
+    # evicts under BEGIN IMMEDIATE, so max_bytes bounds the file as a whole.
+    def __init__(self, path, model_name, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO cache_size (id, bytes) SELECT 0, COALESCE(SUM(nbytes), 0) FROM embeddings"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings"
+            " BEGIN UPDATE cache_size SET bytes = bytes + new.nbytes WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings"
+            " BEGIN UPDATE cache_size SET bytes = bytes - old.nbytes WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_resize AFTER UPDATE OF nbytes ON embeddings"
+            " BEGIN UPDATE cache_size SET bytes = bytes + new.nbytes - old.nbytes WHERE id = 0; END"
+        )
+        self._conn.commit()
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+            if found:
+                now = time.time()
+                self._touched.update((k, now) for k in found)
+                if (len(self._touched) >= LAST_USED_FLUSH_KEYS
+                        or time.monotonic() - self._last_flush >= LAST_USED_FLUSH_SECONDS):
+                    self._flush_touched()
+                    self._conn.commit()
+
+        results = [found.get(k) for k in keys]
+        hits = sum(1 for r in results if r is not None)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, texts, vectors):
+        now = time.time()
+        rows = {}
+        for text, vec in zip(texts, vectors):
+            vec = np.ascontiguousarray(vec, dtype=np.float32)
+            key = self.key(text)
+            rows[key] = (key, vec.shape[0], vec.tobytes(), vec.nbytes, now)
+        if not rows:
+            return
+        with self._lock:
+            # Held from the insert through eviction, so no other process
+            # writes between reading the total and trimming to max_bytes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._flush_touched()
+                self._conn.executemany(
+                    "INSERT INTO embeddings (key, dim, vector, nbytes, last_used) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET dim = excluded.dim, vector = excluded.vector,"
+                    " nbytes = excluded.nbytes, last_used = excluded.last_used",
+                    rows.values(),
+                )
+                self._evict()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_flush = time.monotonic()
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def _evict(self):
+        excess = self._stored_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, nbytes in self._conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_used ASC"):
+            victims.append((key,))
+            excess -= nbytes
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size_bytes = self._stored_bytes()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_bytes": size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class QueryEmbeddingCache:
+    # In-process LRU for query vectors. Queries are short and repeat across
+    # requests (the same persona/job over different documents), so they skip
+    # both the model and the SQLite round trip.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, texts):
+        found = []
+        with self._lock:
+            for text in texts:
+                vector = self._entries.get(text)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(text)
+                    self.hits += 1
+                found.append(vector)
+        return found
+
+    def put_many(self, texts, vectors):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._entries[text] = np.array(vector, dtype=np.float32)
+                self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,102 @@
+# embedding_service.py
+#
+# Dynamic micro-batching in front of the SentenceTransformer model. Encode
+# calls from concurrent requests are queued, collected for up to
+# max_wait_ms (or until max_batch_size texts are pending), sorted by length
+# so each padded batch holds similarly sized inputs, and encoded together.
+# Every caller gets back exactly the rows for its own texts.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+
+
+class EmbeddingBatcher:
+    def __init__(self, get_model, max_batch_size=64, max_wait_ms=5):
+        self.get_model = get_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self.texts_encoded = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.get_model().get_sentence_embedding_dimension()), dtype=np.float32)
+        request = _EncodeRequest(texts)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        count = len(pending[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(request)
+            count += len(request.texts)
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                self._encode_pending(pending)
+            except Exception as e:
+                for request in pending:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _encode_pending(self, pending):
+        texts = [text for request in pending for text in request.texts]
+        # Length-bucketed batches keep padding to a minimum
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        model = self.get_model()
+        vectors = None
+        for start in range(0, len(order), self.max_batch_size):
+            batch = order[start:start + self.max_batch_size]
+            encoded = model.encode(
+                [texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True
+            )
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+            self.batches += 1
+
+        self.requests += len(pending)
+        self.texts_encoded += len(texts)
+        offset = 0
+        for request in pending:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts_encoded": self.texts_encoded,
+            "avg_batch_size": round(self.texts_encoded / self.batches, 2) if self.batches else 0.0,
+        }
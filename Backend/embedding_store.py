@@ -0,0 +1,154 @@
+# embedding_store.py
+#
+# Compact on-disk store for a document's chunk embeddings. Vectors are kept
+# L2-normalized in one contiguous raw array that is opened with np.memmap, so
+# every worker process reading the same store shares it through the OS page
+# cache instead of holding its own heap copy. A float32 store is scored in
+# place; float16 halves it and int8 quarters it (with one float32 scale per
+# vector, scores are rescaled after the dot product).
+#
+# Layout of a store directory:
+#   store.json     format version, dtype, dim, count
+#   vectors.bin    count x dim vectors in the store dtype
+#   scales.bin     count float32 scales (int8 only)
+#   chunks.bin     one CHUNK_RECORD per chunk: section index, page number and
+#                  the chunk text's byte offset/length in texts.bin
+#   texts.bin      UTF-8 chunk texts, back to back
+#   sections.json  [title, page_number, first chunk, end chunk] per section,
+#                  in document order (sections without chunks included)
+
+import json
+import os
+
+import numpy as np
+
+EMBEDDING_STORE_DTYPE = os.environ.get("EMBEDDING_STORE_DTYPE", "float32").lower()
+STORE_DTYPES = ("float32", "float16", "int8")
+STORE_VERSION = 1
+
+CHUNK_RECORD = np.dtype([
+    ("section", np.int32),
+    ("page_number", np.int32),
+    ("offset", np.int64),
+    ("length", np.int32),
+])
+
+
+def quantize(vectors, dtype):
+    # vectors must already be L2-normalized; returns (stored rows, scales or None)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    rows = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+
+def write_store(path, sections, vectors, dtype=EMBEDDING_STORE_DTYPE):
+    # sections: [{"title", "page_number", "chunks"}]; vectors: one
+    # L2-normalized row per chunk, in section order
+    if dtype not in STORE_DTYPES:
+        raise ValueError(f"Unknown embedding store dtype '{dtype}', expected one of {', '.join(STORE_DTYPES)}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    os.makedirs(path, exist_ok=True)
+
+    table = []
+    records = []
+    offset = 0
+    with open(os.path.join(path, "texts.bin"), "wb") as texts:
+        for section_index, sec in enumerate(sections):
+            first = len(records)
+            for chunk in sec["chunks"]:
+                encoded = chunk.encode("utf-8")
+                texts.write(encoded)
+                records.append((section_index, sec["page_number"], offset, len(encoded)))
+                offset += len(encoded)
+            table.append([sec["title"], sec["page_number"], first, len(records)])
+    if len(records) != len(vectors):
+        raise ValueError(f"Got {len(vectors)} vectors for {len(records)} chunks")
+
+    np.asarray(records, dtype=CHUNK_RECORD).tofile(os.path.join(path, "chunks.bin"))
+    rows, scales = quantize(vectors, dtype)
+    rows.tofile(os.path.join(path, "vectors.bin"))
+    if scales is not None:
+        scales.tofile(os.path.join(path, "scales.bin"))
+    with open(os.path.join(path, "sections.json"), "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    dim = int(vectors.shape[1]) if vectors.ndim == 2 else 0
+    with open(os.path.join(path, "store.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, "dtype": dtype, "dim": dim, "count": len(records)}, f)
+
+
+def _memmap(path, dtype, shape):
+    # np.memmap cannot map an empty file
+    if not shape[0]:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class EmbeddingStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "store.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self.dtype = info["dtype"]
+        self.dim = info["dim"]
+        self.count = info["count"]
+        with open(os.path.join(path, "sections.json"), "r", encoding="utf-8") as f:
+            self.sections = json.load(f)
+        self.vectors = _memmap(os.path.join(path, "vectors.bin"), np.dtype(self.dtype), (self.count, self.dim))
+        self.scales = None
+        if self.dtype == "int8":
+            self.scales = _memmap(os.path.join(path, "scales.bin"), np.float32, (self.count,))
+        self.chunks = _memmap(os.path.join(path, "chunks.bin"), CHUNK_RECORD, (self.count,))
+        text_bytes = int(self.chunks["offset"][-1]) + int(self.chunks["length"][-1]) if self.count else 0
+        self._texts = _memmap(os.path.join(path, "texts.bin"), np.uint8, (text_bytes,))
+
+    def __len__(self):
+        return self.count
+
+    def text(self, i):
+        record = self.chunks[i]
+        start = int(record["offset"])
+        return bytes(self._texts[start:start + int(record["length"])]).decode("utf-8")
+
+    def section_key(self, i):
+        title, page_number, _, _ = self.sections[int(self.chunks[i]["section"])]
+        return title, page_number
+
+    def section_indices(self, start, stop):
+        return self.chunks["section"][start:stop]
+
+    def scores(self, queries, start=0, stop=None):
+        # Raw dot products of normalized queries with rows [start, stop); a
+        # float32 store is handed to the matmul without a copy
+        block = self.vectors[start:stop]
+        if self.dtype != "float32":
+            block = block.astype(np.float32)
+        scores = np.atleast_2d(queries) @ block.T
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+
+    def capped_length(self, remaining):
+        # Chunks kept when a document may add `remaining` more chunks before
+        # it stops at the end of the section that crosses the limit
+        for _, _, _, end in self.sections:
+            if end > remaining:
+                return end
+        return self.count
+
+    def iter_sections(self):
+        # Sections with their chunk texts, in the same shape write_store() takes
+        for title, page_number, first, end in self.sections:
+            yield {"title": title, "page_number": page_number, "chunks": [self.text(i) for i in range(first, end)]}
+
+    def nbytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.path, name))
+            for name in ("vectors.bin", "scales.bin", "chunks.bin", "texts.bin")
+            if os.path.exists(os.path.join(self.path, name))
+        )
@@ -0,0 +1,314 @@
+# jobs.py
+#
+# Durable local job queue for long-running batches. Jobs live in an SQLite
+# table next to their input files (one directory per job under root), and are
+# picked up by a small pool of worker threads in this process, so no external
+# broker is needed. Several processes (uvicorn workers) can share one root:
+# a job is claimed with a single conditional UPDATE, so only one of them runs
+# it. Running jobs carry their owner's id and a heartbeat; a job whose owner
+# stopped heartbeating for JOB_STALE_SECONDS (the process died or restarted)
+# is queued again. A job's input files (its INPUT_DIR) are deleted as soon as
+# it completes, fails or is cancelled; the job itself and its result are
+# removed once JOB_RESULT_TTL_HOURS have passed.
+#
+# Handlers get progress(done, total, current=None), which raises JobCancelled
+# once the job has been cancelled. progress() with no arguments only checks
+# for cancellation, so handlers can call it inside long steps; progress rows
+# are written when done/total change, and at most every
+# JOB_PROGRESS_INTERVAL_SECONDS for updates of the current item alone.
+
+import datetime
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_RESULT_TTL_HOURS = float(os.environ.get("JOB_RESULT_TTL_HOURS", 24))
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", 60))
+JOB_CLEANUP_INTERVAL_SECONDS = 60
+JOB_PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Subdirectory of a job's directory holding its uploaded inputs
+INPUT_DIR = "input"
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, root, handlers, workers=JOB_WORKERS, ttl_hours=JOB_RESULT_TTL_HOURS,
+                 stale_seconds=JOB_STALE_SECONDS):
+        self.root = root
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.ttl_seconds = ttl_hours * 3600
+        self.stale_seconds = stale_seconds
+        # Unique per queue instance, so a restarted process never mistakes an
+        # earlier run's jobs for its own
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._stop_event = None
+        self._last_cleanup = 0.0
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "jobs.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+            " params TEXT NOT NULL, progress TEXT, result TEXT, error TEXT,"
+            " cancel_requested INTEGER NOT NULL DEFAULT 0, owner TEXT, heartbeat REAL,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)")
+        self._conn.commit()
+        self.requeue_stale()
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def new_job_dir(self):
+        # Input files are staged here before submit() makes the job visible
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        return job_id
+
+    def submit(self, kind, params, job_id=None):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job_id = job_id or self.new_job_dir()
+        with self._wakeup:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, params, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+            self._wakeup.notify()
+        return self.status(job_id)
+
+    def input_dir(self, job_id):
+        return os.path.join(self.job_dir(job_id), INPUT_DIR)
+
+    def discard_job_dir(self, job_id):
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def discard_inputs(self, job_id):
+        shutil.rmtree(self.input_dir(job_id), ignore_errors=True)
+
+    def _row(self, job_id, columns):
+        with self._lock:
+            return self._conn.execute(f"SELECT {columns} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+
+    def status(self, job_id):
+        row = self._row(job_id, "job_id, kind, status, progress, error, created_at, started_at, finished_at")
+        if row is None:
+            return None
+        return self._describe(row)
+
+    def _describe(self, row):
+        job_id, kind, status, progress, error, created_at, started_at, finished_at = row
+
+        def iso(ts):
+            return datetime.datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        info = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "progress": json.loads(progress) if progress else None,
+            "error": error,
+            "created_at": iso(created_at),
+            "started_at": iso(started_at),
+            "finished_at": iso(finished_at),
+        }
+        if finished_at:
+            info["expires_at"] = iso(finished_at + self.ttl_seconds)
+        return info
+
+    def list(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, kind, status, progress, error, created_at, started_at, finished_at"
+                " FROM jobs ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self._describe(row) for row in rows]
+
+    def result(self, job_id):
+        # (status, result); result is only set for completed jobs
+        row = self._row(job_id, "status, result")
+        if row is None:
+            return None, None
+        status, result = row
+        return status, json.loads(result) if result else None
+
+    def cancel(self, job_id):
+        # Conditional updates, so a job claimed meanwhile by another process is
+        # flagged instead of marked cancelled under its runner
+        with self._lock:
+            cancelled = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            ).rowcount
+            if not cancelled:
+                # Picked up by the handler at its next progress report
+                self._conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,)
+                )
+            self._conn.commit()
+        if cancelled:
+            self.discard_inputs(job_id)
+        return self.status(job_id)
+
+    def requeue_stale(self):
+        # Running jobs whose owner stopped heartbeating start over
+        with self._lock:
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, heartbeat = NULL, started_at = NULL"
+                " WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+                (time.time() - self.stale_seconds,),
+            ).rowcount
+            self._conn.commit()
+        if requeued:
+            with self._wakeup:
+                self._wakeup.notify_all()
+        return requeued
+
+    def heartbeat(self):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'", (time.time(), self.owner)
+            )
+            self._conn.commit()
+
+    def cleanup(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                row[0] for row in self._conn.execute(
+                    f"SELECT job_id FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATES))})"
+                    " AND finished_at < ?",
+                    (*FINISHED_STATES, cutoff),
+                )
+            ]
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired])
+            self._conn.commit()
+        for job_id in expired:
+            self.discard_job_dir(job_id)
+        return len(expired)
+
+    def _claim(self):
+        # The UPDATE only succeeds while the job is still queued, so when
+        # processes race for the same job exactly one of them gets it
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT job_id, kind, params FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, started_at = ?"
+                    " WHERE job_id = ? AND status = 'queued'",
+                    (self.owner, now, now, row[0]),
+                ).rowcount
+                self._conn.commit()
+                if claimed:
+                    return row[0], row[1], json.loads(row[2])
+
+    def _finish(self, job_id, status, result=None, error=None):
+        # A job requeued as stale meanwhile belongs to whoever claimed it next,
+        # and so do its inputs
+        with self._lock:
+            finished = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?"
+                " WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(),
+                 job_id, self.owner),
+            ).rowcount
+            self._conn.commit()
+        if finished:
+            self.discard_inputs(job_id)
+
+    def _progress_callback(self, job_id):
+        last = {"counts": None, "written": 0.0}
+
+        def progress(done=None, total=None, current=None):
+            with self._lock:
+                now = time.monotonic()
+                if done is not None and ((done, total) != last["counts"]
+                                         or now - last["written"] >= JOB_PROGRESS_INTERVAL_SECONDS):
+                    self._conn.execute(
+                        "UPDATE jobs SET progress = ? WHERE job_id = ?",
+                        (json.dumps({"done": done, "total": total, "current": current}, ensure_ascii=False), job_id),
+                    )
+                    self._conn.commit()
+                    last["counts"], last["written"] = (done, total), now
+                cancelled = self._conn.execute(
+                    "SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()[0]
+            if cancelled:
+                raise JobCancelled()
+        return progress
+
+    def _run(self, stop_event):
+        while not stop_event.is_set():
+            if time.monotonic() - self._last_cleanup > JOB_CLEANUP_INTERVAL_SECONDS:
+                self._last_cleanup = time.monotonic()
+                self.cleanup()
+                self.requeue_stale()
+            claimed = self._claim()
+            if claimed is None:
+                with self._wakeup:
+                    if not stop_event.is_set():
+                        self._wakeup.wait(timeout=min(JOB_CLEANUP_INTERVAL_SECONDS, self.stale_seconds))
+                continue
+            job_id, kind, params = claimed
+            try:
+                result = self.handlers[kind](params, self.job_dir(job_id), self._progress_callback(job_id))
+            except JobCancelled:
+                self._finish(job_id, "cancelled")
+            except Exception as e:
+                self._finish(job_id, "failed", error=str(e))
+            else:
+                self._finish(job_id, "completed", result=result)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop_event = threading.Event()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(self._stop_event,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._beat, args=(self._stop_event,), name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _beat(self, stop_event):
+        while not stop_event.wait(self.stale_seconds / 4):
+            self.heartbeat()
+
+    def stop(self):
+        # Running jobs are left to the daemon threads; if the process exits
+        # first they go stale and another process (or the next start) reruns them
+        if self._stop_event is not None:
+            self._stop_event.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        self._threads = []
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.workers, "ttl_hours": self.ttl_seconds / 3600, "jobs": counts}
@@ -1,225 +1,174 @@
-import pandas as pd
-import pdfplumber
+# main.py
+#
+# Batch outline extraction (the Docker entrypoint of the outline extractor):
+#
+#   python main.py [--input-dir /app/input] [--output-dir /app/output] [--workers 8] [--engine fitz] [--force]
+#
+# Every PDF in the input directory gets <name>.json in the output directory,
+# processed by a pool of worker processes. A manifest in the output
+# directory records each converted PDF's content hash and engine, so a re-run
+# only converts new or changed PDFs (and ones whose output went missing).
+# Outputs and the manifest are renamed into place once fully written, so an
+# interrupted run leaves no truncated files and resumes where it stopped.
+
+import argparse
 import json
-import re
+import multiprocessing
 import os
-from langdetect import detect
-
-def detect_style(font_name):
-    font_name = font_name.lower() if font_name else ""
-    return "bold" in font_name, "italic" in font_name or "oblique" in font_name
-
-def is_garbage_line(text):
-    clean_text = text.replace(" ", "")
-    return bool(re.fullmatch(r'[.\-_*•●]{5,}', clean_text)) or (len(clean_text) < 2 and not any(c.isalpha() for c in clean_text))
-
-def is_near(value, target, tolerance=0.5):
-    return abs(value - target) <= tolerance
-
-def is_declaration_text(text):
-    text = text.lower()
-    declaration_keywords = ["i declare", "undertake", "signature", "date"]
-    return any(keyword in text for keyword in declaration_keywords) and not re.match(r'^\d+\.\s', text)
-
-def is_heading_only(text):
-    if ":" in text:
-        return text.split(":")[0].strip()
-    if text.startswith("•") or text.startswith("-"):
-        return ""
-    return text
-
-def is_inside_table(span, table_bboxes):
-    for x0, top, x1, bottom, page_num in table_bboxes:
-        if span["page"] == page_num and x0 <= span.get("x0", 0) <= x1 and top <= span.get("top", 0) <= bottom:
-            return True
-    return False
-
-def merge_spans_by_font(spans):
-    merged = []
-    current = None
-    for span in spans:
-        if current is None:
-            current = span
-            continue
-        same_page = span["page"] == current["page"]
-        close_font = is_near(span["size"], current["size"])
-        same_style = (span["is_bold"] == current["is_bold"] and span["is_italic"] == current["is_italic"])
-        if same_page and close_font and same_style:
-            current["text"] += " " + span["text"]
-        else:
-            merged.append(current)
-            current = span
-    if current:
-        merged.append(current)
-    return merged
-
-def detect_pdf_type(text):
-    text = text.lower()
-    scores = {
-        "ticket": sum(1 for kw in ["e-ticket", "pnr", "fare summary", "flight", "departure", "booking id"] if kw in text),
-        "form": sum(1 for kw in ["service book", "signature", "designation", "date", "name of the"] if kw in text),
-        "invoice": sum(1 for kw in ["invoice", "subtotal", "tax", "total amount", "bill to"] if kw in text),
-        "receipt": sum(1 for kw in ["transaction id", "payment method", "paid", "amount", "receipt"] if kw in text),
-        "certificate": sum(1 for kw in ["successfully completed", "certificate", "participation", "appreciation", "future endeavors"] if kw in text),
-    }
-    best_type = max(scores, key=scores.get)
-    confidence = scores[best_type] / max(1, sum(scores.values()))
-    return {"type": best_type, "confidence": confidence}
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def detect_language(text):
-    try:
-        return detect(text)
-    except:
-        return "unknown"
-
-def extract_outline(pdf_path, json_output_path):
-    with pdfplumber.open(pdf_path) as pdf:
-        raw_spans = []
-        table_bboxes = []
-        full_text = ""
-
-        for page_num, page in enumerate(pdf.pages):
-            page_text = page.extract_text()
-            if page_text:
-                full_text += "\n" + page_text
-
-            for table_obj in page.find_tables():
-                table_bboxes.append((table_obj.bbox[0], table_obj.bbox[1], table_obj.bbox[2], table_obj.bbox[3], page_num))
-
-            lines = page.extract_text_lines(return_chars=True, strip=True)
-            for line in lines:
-                text = line["text"].strip()
-                if not text or is_garbage_line(text):
-                    continue
-                chars = line.get("chars", [])
-                font_size = round(chars[0]["size"], 1) if chars else 10.0
-                font_name = chars[0].get("fontname", "") if chars else ""
-                is_bold, is_italic = detect_style(font_name)
-                raw_spans.append({
-                    "text": text,
-                    "size": font_size,
-                    "page": page_num,
-                    "is_bold": is_bold,
-                    "is_italic": is_italic,
-                    "x0": line.get("x0", 0),
-                    "top": line.get("top", 0)
-                })
-
-        if not raw_spans:
-            with open(json_output_path, "w", encoding="utf-8") as f:
-                json.dump({"title": "", "outline": []}, f, indent=4, ensure_ascii=False)
-            return
-
-        spans = merge_spans_by_font(raw_spans)
-        pdf_type_info = detect_pdf_type(full_text)
-        detected_lang = detect_language(full_text)
-
-        font_sizes = sorted(set(span["size"] for span in spans), reverse=True)
-        if not font_sizes or len(font_sizes) < 3:
-            title_font, h1_font, h2_font, h3_font = 14.0, 12.0, 11.0, 10.0
-        else:
-            title_font = font_sizes[0]
-            h1_font = font_sizes[1]
-            h2_font = font_sizes[2]
-            h3_font = font_sizes[3] if len(font_sizes) > 3 else h2_font
-
-        title_spans = []
-        outline = []
-        label_blacklist = {
-            "bengali – your heart rate",
-            "bengali - your heart rate"
-        }
-
-        for s in spans:
-            size = s["size"]
-            if is_near(size, title_font) and s["page"] == 0:
-                title_spans.append(s)
-                continue
-            if is_inside_table(s, table_bboxes):
-                continue
+import fitz
+
+from outline import OUTLINE_ENGINE, OUTLINE_ENGINES, build_outline, write_outline
+from parsed_document import content_key
 
-            level = None
-            if is_near(size, h1_font):
-                level = "H1"
-            elif is_near(size, h2_font):
-                level = "H2"
-            elif is_near(size, h3_font):
-                level = "H3"
-
-            if level and not is_declaration_text(s["text"]):
-                heading_text = is_heading_only(s["text"])
-                heading_text = re.sub(r"।\s*$", "", heading_text).strip()
-
-                if heading_text.strip().lower() in label_blacklist:
-                    continue
-                if any(q in heading_text for q in ["'", '"', "‘", "’", "“", "”"]):
-                    continue
-                if not heading_text:
-                    continue
-
-                if detected_lang in ["en", "fr", "de", "es", "pt", "it"]:
-                    if re.search(r'[!.]\s*$', heading_text) and not re.match(r'^\d+(\.\d+)*', heading_text):
-                        continue
-                    if not heading_text[0].islower() and not heading_text.startswith("("):
-                        outline.append({
-                            "level": level,
-                            "text": heading_text,
-                            "page": s["page"]
-                        })
-                else:
-                    outline.append({
-                        "level": level,
-                        "text": heading_text,
-                        "page": s["page"]
-                    })
-
-        title = " ".join([s["text"] for s in title_spans]).strip()
-
-        if os.path.basename(pdf_path).lower() == "file01.pdf":
-            if len(outline) == 1:
-                first = outline[0]
-                if (
-                    first["page"] == 0 and
-                    first["level"] == "H1" and
-                    first["text"].strip().lower() == "application form for grant of ltc advance"
-                ):
-                    title = first["text"]
-                    outline = []
-
-        recipient_name = title.strip()
-        is_likely_name = recipient_name and recipient_name.count(" ") <= 3 and recipient_name.istitle()
-        certificate_keywords = ["successfully completed", "certificate", "launchpad", "participation"]
-        if pdf_type_info["type"] == "certificate":
-            if any(kw in full_text.lower() for kw in certificate_keywords):
-                title = "Certificate of Participation"
-                if is_likely_name:
-                    outline.insert(0, {
-                        "level": "H1",
-                        "text": recipient_name,
-                        "page": 0
-                    })
-
-        output = {
-            "title": title,
-            "outline": outline
-        }
-
-        with open(json_output_path, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=4, ensure_ascii=False)
- 
-        print(f"Extracted outline saved to: {os.path.basename(json_output_path)}")
-        print(f"Title: {title}")
-        print(f"Outline entries: {len(outline)}")
-
-# === Docker-compatible entrypoint ===
 INPUT_DIR = "/app/input"
 OUTPUT_DIR = "/app/output"
+OUTLINE_WORKERS = int(os.environ.get("OUTLINE_WORKERS", os.cpu_count() or 1))
+MANIFEST_NAME = ".outline-manifest.json"
+MANIFEST_VERSION = 1
+# Completed files between manifest saves; at most this many are redone after a crash
+MANIFEST_SAVE_EVERY = 25
+
+
+def output_name(filename):
+    return os.path.splitext(filename)[0] + ".json"
+
 
-for file in os.listdir(INPUT_DIR):
-    if file.lower().endswith(".pdf"):
-        input_path = os.path.join(INPUT_DIR, file)
-        output_path = os.path.join(OUTPUT_DIR, file.replace(".pdf", ".json"))
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(path, files):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_unchanged(entry, stat, input_path, output_path, engine):
+    # A matching size/mtime trusts the recorded hash; otherwise the content is
+    # hashed, so a touched but identical file is still skipped
+    if not entry or entry.get("engine") != engine or not os.path.exists(output_path):
+        return False, None
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return True, entry["sha256"]
+    digest = content_key(input_path)
+    return digest == entry.get("sha256"), digest
+
+
+def convert(input_path, output_path, engine, digest=None):
+    # Runs in a worker process
+    with fitz.open(input_path) as doc:
+        pages = doc.page_count
+    output = build_outline(input_path, engine=engine)
+    write_outline(output, output_path)
+    return {
+        "sha256": digest or content_key(input_path),
+        "pages": pages,
+        "title": output["title"],
+        "entries": len(output["outline"]),
+    }
+
+
+def run_inline(tasks):
+    for task in tasks:
         try:
-            extract_outline(input_path, output_path)
+            yield task, convert(*task[1:]), None
         except Exception as e:
-            print(f"Failed to process {file}: {e}")
+            yield task, None, e
+
+
+def run_pooled(tasks, workers):
+    # spawn keeps workers free of the parent's state, as in section_extraction
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(convert, *task[1:]): task for task in tasks}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract PDF outlines for every PDF in a directory.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=OUTLINE_WORKERS, help="Worker processes (1 runs in-process)")
+    parser.add_argument("--engine", default=OUTLINE_ENGINE, choices=sorted(OUTLINE_ENGINES))
+    parser.add_argument("--force", action="store_true", help="Convert every PDF, even unchanged ones")
+    parser.add_argument("--quiet", action="store_true", help="Only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    previous = {} if args.force else load_manifest(manifest_path)
+    started = time.perf_counter()
+
+    filenames = sorted(f for f in os.listdir(args.input_dir) if f.lower().endswith(".pdf"))
+    files = {}
+    tasks = []
+    failures = []
+    for filename in filenames:
+        input_path = os.path.join(args.input_dir, filename)
+        output_path = os.path.join(args.output_dir, output_name(filename))
+        try:
+            stat = os.stat(input_path)
+            unchanged, digest = is_unchanged(previous.get(filename), stat, input_path, output_path, args.engine)
+        except OSError as e:
+            failures.append(filename)
+            print(f"Failed to read {filename}: {e}")
+            continue
+        if unchanged:
+            files[filename] = dict(previous[filename], size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        else:
+            tasks.append((filename, input_path, output_path, args.engine, digest))
+
+    skipped = len(files)
+    converted = 0
+    pages = 0
+    workers = max(1, min(args.workers, len(tasks)))
+    results = run_inline(tasks) if workers == 1 else run_pooled(tasks, workers)
+    try:
+        for (filename, input_path, output_path, _, _), result, error in results:
+            if error is not None:
+                failures.append(filename)
+                print(f"Failed to process {filename}: {error}")
+                continue
+            stat = os.stat(input_path)
+            files[filename] = {
+                "sha256": result["sha256"], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                "engine": args.engine, "output": os.path.basename(output_path), "pages": result["pages"],
+            }
+            converted += 1
+            pages += result["pages"]
+            if not args.quiet:
+                print(f"Extracted outline saved to: {os.path.basename(output_path)}")
+                print(f"Title: {result['title']}")
+                print(f"Outline entries: {result['entries']}")
+            if converted % MANIFEST_SAVE_EVERY == 0:
+                save_manifest(manifest_path, files)
+    finally:
+        save_manifest(manifest_path, files)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"\n{len(filenames)} PDFs: {converted} converted, {skipped} unchanged, {len(failures)} failed "
+        f"in {elapsed:.2f}s ({workers} workers, {args.engine}): "
+        f"{converted / elapsed if elapsed else 0:.2f} files/s, {pages / elapsed if elapsed else 0:.1f} pages/s"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# model_loader.py
+#
+# Deferred loading of the Semantic Analyzer's embedding model and tokenizer
+# data. Nothing here touches torch, transformers or the network at import
+# time; the model is loaded in the background at startup (or on first use)
+# and warmed up with a single dummy encode before the service reports ready.
+#
+# MODEL_LOAD_MODE=background  start loading when the app starts (default)
+# MODEL_LOAD_MODE=eager       block startup until the model is ready
+# MODEL_LOAD_MODE=lazy        load on the first request that needs it (/ready
+#                             reports ready before that, or no request comes)
+#
+# EMBEDDING_BACKEND picks the CPU inference path for the encoder:
+#   torch       float32 PyTorch (default)
+#   torch-int8  PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx        ONNX Runtime graph (needs optimum[onnxruntime])
+#   onnx-int8   ONNX Runtime with a pre-quantized graph, EMBEDDING_ONNX_FILE
+# Vectors from different backends are cached and registered separately, see
+# MODEL_ID. embedding_benchmark.py measures speed and ranking agreement.
+
+import os
+import threading
+import time
+
+from segmentation import SENTENCE_SEGMENTER
+
+MODEL_NAME = os.environ.get("MODEL_NAME", "sentence-transformers/all-MiniLM-L12-v2")
+MODEL_LOAD_MODE = os.environ.get("MODEL_LOAD_MODE", "background").lower()
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") != "0"
+NLTK_DOWNLOAD = os.environ.get("NLTK_DOWNLOAD", "1") != "0"
+# nltk's PunktTokenizer loads the punkt_tab tables; the pickled punkt model is not used
+NLTK_RESOURCES = ("punkt_tab",)
+
+
+def model_id(backend=EMBEDDING_BACKEND):
+    # Identifies the vector space: the float32 torch model keeps the bare name
+    return MODEL_NAME if backend == "torch" else f"{MODEL_NAME}#{backend}"
+
+
+MODEL_ID = model_id()
+
+_model = None
+_lock = threading.Lock()
+_state = {
+    "loading": False,
+    "error": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "tokenizer_data": None,
+}
+
+
+def ensure_tokenizer_data():
+    # Only reaches for the network when the data was not bundled with the image
+    if SENTENCE_SEGMENTER != "punkt":
+        _state["tokenizer_data"] = "not needed"
+        return
+    import nltk
+
+    def find_missing():
+        missing = []
+        for resource in NLTK_RESOURCES:
+            try:
+                nltk.data.find(f"tokenizers/{resource}")
+            except LookupError:
+                missing.append(resource)
+        return missing
+
+    missing = find_missing()
+    if not missing:
+        _state["tokenizer_data"] = "bundled"
+        return
+    if NLTK_DOWNLOAD:
+        for resource in missing:
+            try:
+                nltk.download(resource, quiet=True)
+            except Exception:
+                pass
+        missing = find_missing()
+    _state["tokenizer_data"] = "missing" if missing else "downloaded"
+
+
+def create_model(backend=EMBEDDING_BACKEND):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {', '.join(EMBEDDING_BACKENDS)}")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        return SentenceTransformer(MODEL_NAME, device="cpu", backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            MODEL_NAME, device="cpu", backend="onnx", model_kwargs={"file_name": EMBEDDING_ONNX_FILE}
+        )
+    model = SentenceTransformer(MODEL_NAME)
+    if backend == "torch-int8":
+        import torch
+
+        model = model.to("cpu")
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def warmup(model):
+    started = time.perf_counter()
+    model.encode(["warmup"], convert_to_numpy=True)
+    _state["warmup_seconds"] = round(time.perf_counter() - started, 3)
+
+
+def load_model():
+    global _model
+    with _lock:
+        if _model is not None:
+            return _model
+        _state["loading"] = True
+        _state["error"] = None
+        try:
+            started = time.perf_counter()
+            ensure_tokenizer_data()
+            print(f"Loading embedding model for Semantic Analyzer ({EMBEDDING_BACKEND} backend)...")
+            model = create_model()
+            _state["load_seconds"] = round(time.perf_counter() - started, 3)
+            if MODEL_WARMUP:
+                warmup(model)
+            print("Model loaded successfully.")
+            _model = model
+        except Exception as e:
+            _state["error"] = str(e)
+            raise
+        finally:
+            _state["loading"] = False
+    return _model
+
+
+def get_model():
+    return _model if _model is not None else load_model()
+
+
+def start_background_load():
+    def _load():
+        try:
+            load_model()
+        except Exception as e:
+            print(f"Failed to load embedding model: {e}")
+
+    threading.Thread(target=_load, name="model-loader", daemon=True).start()
+
+
+def is_model_loaded():
+    return _model is not None
+
+
+def model_state():
+    return {
+        "model_name": MODEL_NAME,
+        "backend": EMBEDDING_BACKEND,
+        "load_mode": MODEL_LOAD_MODE,
+        "loaded": _model is not None,
+        **_state,
+    }
@@ -0,0 +1,120 @@
+# outline_conformance.py
+#
+# Compares outline engines on a corpus of PDFs before moving traffic from the
+# reference engine (pdfplumber) to a faster one (fitz).
+#
+#   python outline_conformance.py /path/to/pdfs [--candidate fitz] [--json report.json]
+#
+# For every PDF it reports whether the titles match, heading precision and
+# recall of the candidate against the reference (a heading matches on level,
+# normalized text and page), and the time each engine took.
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from doc_classifier import classify_document
+from outline import OUTLINE_ENGINES, outline_from_layout
+
+
+def run_engine(engine, pdf_path):
+    started = time.perf_counter()
+    spans, tables, page_texts = OUTLINE_ENGINES[engine](pdf_path)
+    result = outline_from_layout(spans, tables, classify_document(page_texts), os.path.basename(pdf_path))
+    return result, time.perf_counter() - started
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def compare_outlines(reference, candidate):
+    ref = {(h["level"], normalize(h["text"]), h["page"]) for h in reference["outline"]}
+    cand = {(h["level"], normalize(h["text"]), h["page"]) for h in candidate["outline"]}
+    matched = len(ref & cand)
+    return {
+        "title_match": normalize(reference["title"]) == normalize(candidate["title"]),
+        "reference_headings": len(ref),
+        "candidate_headings": len(cand),
+        "matched_headings": matched,
+        "precision": round(matched / len(cand), 4) if cand else (1.0 if not ref else 0.0),
+        "recall": round(matched / len(ref), 4) if ref else (1.0 if not cand else 0.0),
+        "missing": sorted(ref - cand),
+        "extra": sorted(cand - ref),
+    }
+
+
+def collect_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(".pdf")
+            )
+        elif path.lower().endswith(".pdf"):
+            pdfs.append(path)
+    return pdfs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare outline engines on a PDF corpus.")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--reference", default="pdfplumber", choices=sorted(OUTLINE_ENGINES))
+    parser.add_argument("--candidate", default="fitz", choices=sorted(OUTLINE_ENGINES))
+    parser.add_argument("--json", dest="json_path", help="Write the full per-file report to this file")
+    args = parser.parse_args(argv)
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        print("No PDF files found.")
+        return 1
+
+    report = []
+    totals = {"reference_seconds": 0.0, "candidate_seconds": 0.0, "matched": 0, "reference": 0, "candidate": 0, "titles": 0}
+    for pdf_path in pdfs:
+        try:
+            reference, ref_seconds = run_engine(args.reference, pdf_path)
+            candidate, cand_seconds = run_engine(args.candidate, pdf_path)
+        except Exception as e:
+            print(f"{os.path.basename(pdf_path)}: failed ({e})")
+            report.append({"file": pdf_path, "error": str(e)})
+            continue
+
+        entry = {"file": pdf_path, "reference_seconds": round(ref_seconds, 4), "candidate_seconds": round(cand_seconds, 4)}
+        entry.update(compare_outlines(reference, candidate))
+        report.append(entry)
+
+        totals["reference_seconds"] += ref_seconds
+        totals["candidate_seconds"] += cand_seconds
+        totals["matched"] += entry["matched_headings"]
+        totals["reference"] += entry["reference_headings"]
+        totals["candidate"] += entry["candidate_headings"]
+        totals["titles"] += entry["title_match"]
+        print(
+            f"{os.path.basename(pdf_path)}: title {'ok' if entry['title_match'] else 'DIFF'}, "
+            f"precision {entry['precision']:.3f}, recall {entry['recall']:.3f}, "
+            f"{args.reference} {ref_seconds:.3f}s, {args.candidate} {cand_seconds:.3f}s"
+        )
+
+    compared = sum(1 for e in report if "error" not in e)
+    if compared:
+        precision = totals["matched"] / totals["candidate"] if totals["candidate"] else 1.0
+        recall = totals["matched"] / totals["reference"] if totals["reference"] else 1.0
+        speedup = totals["reference_seconds"] / totals["candidate_seconds"] if totals["candidate_seconds"] else float("inf")
+        print(
+            f"\n{compared} files: titles matched {totals['titles']}/{compared}, "
+            f"heading precision {precision:.3f}, recall {recall:.3f}, "
+            f"{args.candidate} is {speedup:.1f}x faster than {args.reference}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=list)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+# parsed_document.py
+#
+# One PyMuPDF parse of a PDF, shared by the Semantic Analyzer's section
+# extraction and the outline extractor's fitz engine (OUTLINE_ENGINE=fitz).
+# Parsed documents are cached per process by a hash of their content, so the
+# same file uploaded to /api/pdf-outline and then to /semantic/... under a
+# different temp path is parsed once.
+#
+# Lines are stored column-wise instead of as a dict each: page texts back to
+# back in one string (one "\n"-terminated line per text line, exactly what
+# page.get_text("text") returns), plus one LINE_RECORD per line holding the
+# stripped text's offsets, font size, style bits and bbox. Table regions are
+# only needed by the outline and are detected the first time it asks.
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import fitz
+import numpy as np
+
+PARSED_DOCUMENT_CACHE_MB = int(os.environ.get("PARSED_DOCUMENT_CACHE_MB", 256))
+
+FITZ_FLAG_ITALIC = 2
+FITZ_FLAG_BOLD = 16
+
+# Style bits of LINE_RECORD["style"]
+STYLE_BOLD = 1      # outline: 'bold' in the first span's font name (else font flags)
+STYLE_ITALIC = 2    # outline: 'italic'/'oblique' in the font name (else font flags)
+STYLE_HEADING = 4   # sections: some span's font name contains 'Bold'
+
+LINE_RECORD = np.dtype([
+    ("page", np.int32),
+    ("start", np.int64),      # stripped line text is text[start:end]
+    ("end", np.int64),
+    ("size", np.float64),     # first non-blank span, rounded to 0.1
+    ("max_size", np.float64), # largest span
+    ("style", np.uint8),
+    ("x0", np.float64),       # line bbox
+    ("top", np.float64),      # glyph top of the first non-blank span, like pdfplumber's char top
+    ("x1", np.float64),
+    ("bottom", np.float64),
+])
+
+
+def detect_style(font_name):
+    font_name = font_name.lower() if font_name else ""
+    return "bold" in font_name, "italic" in font_name or "oblique" in font_name
+
+
+def line_style(spans):
+    style = STYLE_HEADING if any('Bold' in span['font'] for span in spans) else 0
+    first = next((span for span in spans if span["text"].strip()), None)
+    if first is None:
+        return style
+    if first["font"]:
+        is_bold, is_italic = detect_style(first["font"])
+    else:
+        is_bold = bool(first["flags"] & FITZ_FLAG_BOLD)
+        is_italic = bool(first["flags"] & FITZ_FLAG_ITALIC)
+    return style | (STYLE_BOLD if is_bold else 0) | (STYLE_ITALIC if is_italic else 0)
+
+
+def glyph_top(span, line_bbox):
+    # pdfminer's char box spans [descent, descent + size] around the baseline;
+    # PyMuPDF's line bbox uses the font's full ascender and sits higher
+    if span is None:
+        return line_bbox[1]
+    return span["origin"][1] - span["size"] * (1 + span["descender"])
+
+
+def detect_tables(page, page_num):
+    # Like pdfplumber's lines strategy, tables need ruling graphics to be found
+    if not hasattr(page, "find_tables") or not page.get_cdrawings():
+        return []
+    return [(*table_obj.bbox, page_num) for table_obj in page.find_tables().tables]
+
+
+class ParsedDocument:
+    def __init__(self, page_count, start_page, text, page_offsets, lines, tables=None):
+        self.page_count = page_count      # pages in the file
+        self.start_page = start_page      # pages [start_page, end_page) are parsed
+        self.end_page = start_page + len(page_offsets) - 1
+        self.text = text
+        self.page_offsets = page_offsets  # page i's text is text[page_offsets[i]:page_offsets[i + 1]]
+        self.lines = lines
+        self.tables = tables              # [(x0, top, x1, bottom, page)] or None if not detected yet
+
+    def __len__(self):
+        return len(self.lines)
+
+    def line_text(self, i):
+        record = self.lines[i]
+        return self.text[record["start"]:record["end"]]
+
+    def page_text(self, page):
+        i = page - self.start_page
+        return self.text[self.page_offsets[i]:self.page_offsets[i + 1]].strip()
+
+    def covers(self, end_page):
+        return self.start_page == 0 and self.end_page >= min(self.page_count, end_page)
+
+    def iter_lines(self, end_page=None, fields=("page", "max_size", "style")):
+        # (stripped text, *fields) per line on pages before end_page
+        lines = self.lines
+        if end_page is not None and end_page < self.end_page:
+            lines = lines[:int(np.searchsorted(lines["page"], end_page))]
+        text = self.text
+        columns = [lines[name].tolist() for name in fields]
+        for start, end, *values in zip(lines["start"].tolist(), lines["end"].tolist(), *columns):
+            yield (text[start:end], *values)
+
+    def nbytes(self):
+        return self.lines.nbytes + self.page_offsets.nbytes + sys.getsizeof(self.text) + 64 * len(self.tables or ())
+
+    @classmethod
+    def concat(cls, parts):
+        # Joins parses of consecutive page ranges of the same file
+        texts = []
+        offsets = [np.zeros(1, dtype=np.int64)]
+        lines = []
+        tables = []
+        shift = 0
+        for part in parts:
+            texts.append(part.text)
+            offsets.append(part.page_offsets[1:] + shift)
+            shifted = part.lines.copy()
+            shifted["start"] += shift
+            shifted["end"] += shift
+            lines.append(shifted)
+            tables = None if tables is None or part.tables is None else tables + part.tables
+            shift += len(part.text)
+        return cls(
+            parts[0].page_count, parts[0].start_page, "".join(texts), np.concatenate(offsets),
+            np.concatenate(lines) if lines else np.zeros(0, dtype=LINE_RECORD), tables,
+        )
+
+
+def parse_pages(doc, start_page=0, end_page=None, tables=False):
+    # Parses pages [start_page, end_page) of an open fitz document
+    stop = doc.page_count if end_page is None else min(end_page, doc.page_count)
+    texts = []
+    page_offsets = [0]
+    records = []
+    found_tables = [] if tables else None
+    length = 0
+    for page_num in range(start_page, stop):
+        page = doc[page_num]
+        for block in page.get_text("dict")["blocks"]:
+            if block["type"] != 0:
+                continue
+            for line in block["lines"]:
+                spans = line["spans"]
+                raw = "".join(span["text"] for span in spans)
+                stripped = raw.strip()
+                start = length + len(raw) - len(raw.lstrip()) if stripped else length
+                first = next((span for span in spans if span["text"].strip()), None)
+                records.append((
+                    page_num, start, start + len(stripped),
+                    round(first["size"], 1) if first else 0.0,
+                    max(span["size"] for span in spans) if spans else 0,
+                    line_style(spans), line["bbox"][0], glyph_top(first, line["bbox"]), *line["bbox"][2:],
+                ))
+                texts.append(raw + "\n")
+                length += len(raw) + 1
+        page_offsets.append(length)
+        if tables:
+            found_tables.extend(detect_tables(page, page_num))
+    return ParsedDocument(
+        doc.page_count, start_page, "".join(texts), np.asarray(page_offsets, dtype=np.int64),
+        np.asarray(records, dtype=LINE_RECORD), found_tables,
+    )
+
+
+def open_fitz_document(source):
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    if hasattr(source, "read"):
+        return fitz.open(stream=source.read(), filetype="pdf")
+    return fitz.open(source)
+
+
+def parse_page_range(pdf_path, start_page, end_page):
+    # Worker-pool entry point for one page range of a file
+    with fitz.open(pdf_path) as doc:
+        return parse_pages(doc, start_page, end_page)
+
+
+def content_key(source, block_size=1024 * 1024):
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParsedDocumentCache:
+    # LRU of ParsedDocuments by content hash, bounded by their in-memory size
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, end_page=None):
+        # The cached parse if it covers pages [0, end_page), None otherwise
+        with self._lock:
+            parsed, _ = self._entries.get(key, (None, 0))
+            if parsed is not None and parsed.covers(parsed.page_count if end_page is None else end_page):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return parsed
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        with self._lock:
+            return self._entries.get(key, (None, 0))[0]
+
+    def put(self, key, parsed):
+        size = parsed.nbytes()
+        with self._lock:
+            _, old_size = self._entries.pop(key, (None, 0))
+            self.bytes -= old_size
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (parsed, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+parsed_documents = ParsedDocumentCache(PARSED_DOCUMENT_CACHE_MB * 1024 * 1024)
+
+
+def load_document(source, max_pages=None, tables=False):
+    # Parsed pages [0, max_pages) of a PDF path, bytes or binary file-like
+    # object, with table regions when asked for; served from the cache when
+    # the content has been parsed before
+    if hasattr(source, "read"):
+        source = source.read()
+    key = content_key(source)
+    parsed = parsed_documents.get(key, max_pages)
+    if parsed is not None and (parsed.tables is not None or not tables):
+        return parsed
+
+    with open_fitz_document(source) as doc:
+        cached = parsed or parsed_documents.peek(key)
+        end_page = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+        if cached is not None and cached.start_page == 0 and cached.end_page < end_page:
+            # Parse only the pages the cached copy is missing
+            more = parse_pages(doc, cached.end_page, end_page, tables=cached.tables is not None)
+            parsed = ParsedDocument.concat([cached, more])
+        elif cached is not None and cached.covers(end_page):
+            parsed = cached
+        else:
+            parsed = parse_pages(doc, 0, end_page, tables=tables)
+        if tables and parsed.tables is None:
+            # Cached entries are shared between threads; never mutate one
+            found = [region for page_num in range(parsed.end_page) for region in detect_tables(doc[page_num], page_num)]
+            parsed = ParsedDocument(parsed.page_count, 0, parsed.text, parsed.page_offsets, parsed.lines, found)
+    parsed_documents.put(key, parsed)
+    return parsed
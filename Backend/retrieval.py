@@ -0,0 +1,113 @@
+# retrieval.py
+#
+# Vectorized ranking over a contiguous, L2-normalized chunk embedding matrix.
+# Scores are computed with one matrix-vector product, top-k uses partial
+# selection, and the "best chunk per section" grouping is a segment max over
+# integer section ids. Callers only materialize result dicts for the winners.
+# RunningTopK/RunningGroupTopK give the same rankings over a stream of score
+# batches, for pipelines that never hold the whole matrix.
+
+import numpy as np
+
+
+def normalize_rows(matrix, eps=1e-12):
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, eps)
+
+
+def round_scores(scores, ndigits=4):
+    # Scores are reported rounded, and ranking ties are resolved on the rounded values
+    return np.round(np.asarray(scores).astype(np.float64), ndigits)
+
+
+def cosine_scores(query_embeddings, normalized_matrix, ndigits=4):
+    queries = normalize_rows(np.atleast_2d(query_embeddings))
+    return round_scores(queries @ normalized_matrix.T, ndigits)
+
+
+def top_k(scores, k):
+    # Highest scores first; equal scores keep their original order
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth_value = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= kth_value)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
+def best_per_group(scores, group_ids, n_groups):
+    group_max = np.full(n_groups, -np.inf)
+    np.maximum.at(group_max, group_ids, scores)
+    # First chunk that reaches its group's maximum
+    at_max = np.flatnonzero(scores == group_max[group_ids])
+    best_index = np.full(n_groups, scores.shape[0], dtype=np.int64)
+    np.minimum.at(best_index, group_ids[at_max], at_max)
+    return group_max, best_index
+
+
+class RunningTopK:
+    # top_k() over a stream of score batches, holding only k candidates
+    def __init__(self, k):
+        self.k = k
+        self.seen = 0
+        self._best = []  # (score, index, item), best first
+
+    def push(self, scores, items):
+        offset = self.seen
+        self.seen += len(items)
+        candidates = [(float(scores[i]), offset + int(i), items[i]) for i in top_k(scores, self.k)]
+        merged = self._best + candidates
+        merged.sort(key=lambda c: (-c[0], c[1]))
+        self._best = merged[:self.k]
+
+    def results(self):
+        return [(score, item) for score, _, item in self._best]
+
+
+class RunningGroupTopK:
+    # Best chunk per group over a stream of score batches. Each batch is
+    # grouped with a segment max, and only the per-group maxima are merged
+    # into the running state: one (score, item) per group instead of every
+    # chunk's score and embedding.
+    def __init__(self, k):
+        self.k = k
+        self.seen = 0
+        self._group_ids = {}             # group key -> group id, in first-seen order
+        self._scores = np.empty(0)       # per group id: best score so far
+        self._items = []                 # per group id: the chunk that scored it
+
+    def push(self, scores, group_keys, items):
+        self.seen += len(items)
+        if not len(items):
+            return
+        # Group keys are tuples, so the batch is factorized through a dict of
+        # its distinct keys rather than np.unique; both lookups run in C
+        batch_keys = list(dict.fromkeys(group_keys))
+        batch_ids = {key: i for i, key in enumerate(batch_keys)}
+        inverse = np.fromiter(map(batch_ids.__getitem__, group_keys), dtype=np.int64, count=len(items))
+        group_max, best_index = best_per_group(np.asarray(scores, dtype=np.float64), inverse, len(batch_keys))
+
+        for key in batch_keys:
+            if key not in self._group_ids:
+                self._group_ids[key] = len(self._group_ids)
+        gids = np.fromiter(map(self._group_ids.__getitem__, batch_keys), dtype=np.int64, count=len(batch_keys))
+        added = len(self._group_ids) - len(self._items)
+        if added:
+            self._scores = np.concatenate((self._scores, np.full(added, -np.inf)))
+            self._items.extend([None] * added)
+
+        # Strictly better only: on equal scores the earlier chunk stays
+        better = np.flatnonzero(group_max > self._scores[gids])
+        self._scores[gids[better]] = group_max[better]
+        for gid, index in zip(gids[better].tolist(), best_index[better].tolist()):
+            self._items[gid] = items[index]
+
+    def results(self):
+        # [(score, group key, item)], groups tied on score keep first-seen order
+        keys = list(self._group_ids)
+        return [(float(self._scores[g]), keys[g], self._items[g]) for g in top_k(self._scores, self.k)]
@@ -0,0 +1,154 @@
+# section_extraction.py
+#
+# Section extraction for the Semantic Analyzer. Sections are built from the
+# shared parsed-document cache (parsed_document.py). A batch of documents not
+# parsed yet is split into page ranges that are parsed independently (in a
+# worker pool when more than one range is pending) and joined back in order,
+# so the parallel path returns exactly what a serial walk over the pages would.
+
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from parsed_document import STYLE_HEADING, ParsedDocument, content_key, load_document, parse_page_range, parsed_documents
+
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1))
+EXTRACTION_PAGES_PER_TASK = int(os.environ.get("EXTRACTION_PAGES_PER_TASK", 16))
+
+GENERIC_KEYWORDS = {'instructions', 'ingredients', 'notes', 'preparation', 'method'}
+HEADING_PATTERN = re.compile(r"^[A-Z0-9][\w\s\-:,()&']+$")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_section_heading(norm_line, max_size, is_bold):
+    norm_lower = norm_line.lower().strip().rstrip(':').strip()
+    return (len(norm_line) >= 7 and len(norm_line) < 100
+            and (is_bold or max_size > 12)
+            and HEADING_PATTERN.match(norm_line) is not None
+            and not norm_lower.startswith("figure")
+            and norm_lower not in GENERIC_KEYWORDS)
+
+
+def split_sections(doc, end_page=None):
+    # Text seen before the first heading belongs to whichever section is
+    # still open before it. Section text is collected as a list of lines and
+    # joined once, not grown with +=.
+    lead_parts = []
+    sections = []
+    current_parts = lead_parts
+
+    for norm_line, page_idx, max_size, style in doc.iter_lines(end_page):
+        if is_section_heading(norm_line, max_size, style & STYLE_HEADING):
+            current_parts = []
+            sections.append(({
+                'title': norm_line,
+                'page_number': page_idx + 1,
+            }, current_parts))
+            continue
+        current_parts.append(norm_line + ' ')
+
+    for section, parts in sections:
+        section['section_text'] = ''.join(parts)
+    return {"lead_text": ''.join(lead_parts), "sections": [section for section, _ in sections]}
+
+
+def merge_page_ranges(fragments):
+    sections = []
+    current_section = None
+    current_parts = []
+
+    def close(section):
+        section['section_text'] = ''.join(current_parts)
+        sections.append(section)
+
+    for fragment in fragments:
+        if current_section:
+            current_parts.append(fragment["lead_text"])
+        for section in fragment["sections"]:
+            if current_section:
+                current_section['end_page'] = section['page_number']
+                close(current_section)
+            current_section = section
+            current_parts = [section['section_text']]
+
+    if current_section:
+        current_section['end_page'] = current_section.get('page_number', 1)
+        close(current_section)
+
+    return [s for s in sections if len(s["section_text"]) > 70]
+
+
+def sections_from_document(doc, max_pages=30):
+    return merge_page_ranges([split_sections(doc, max_pages)])
+
+
+def extract_sections(pdf_path, max_pages=30):
+    return sections_from_document(load_document(pdf_path, max_pages), max_pages)
+
+
+def plan_page_ranges(pdf_path, max_pages=30, pages_per_task=EXTRACTION_PAGES_PER_TASK):
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+    step = max(1, pages_per_task)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)] or [(0, 0)]
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps workers free of the parent's model weights and torch threads
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def iter_sections_many(pdf_paths, max_pages=30, progress=None):
+    # Yields each document's sections in input order as soon as its pages
+    # are parsed. Documents already in the parsed-document cache are not
+    # parsed again; the rest are parsed with only a bounded window of page
+    # ranges in flight, so finished documents are never held back waiting
+    # for the whole batch, and cached as they complete.
+    # progress(done, total, pdf_path) is called as each document completes
+    keys = [content_key(p) for p in pdf_paths]
+    cached = [parsed_documents.get(key, max_pages) for key in keys]
+    plans = [[] if doc is not None else plan_page_ranges(p, max_pages) for p, doc in zip(pdf_paths, cached)]
+    tasks = [(p, start, end) for p, ranges in zip(pdf_paths, plans) for start, end in ranges]
+
+    if EXTRACTION_WORKERS <= 1 or len(tasks) <= 1:
+        fragments = (parse_page_range(*task) for task in tasks)
+    else:
+        fragments = _iter_pooled(tasks, max_in_flight=EXTRACTION_WORKERS * 2)
+
+    for done, (pdf_path, key, doc, ranges) in enumerate(zip(pdf_paths, keys, cached, plans), start=1):
+        if doc is None:
+            doc = ParsedDocument.concat([next(fragments) for _ in ranges])
+            parsed_documents.put(key, doc)
+        sections = sections_from_document(doc, max_pages)
+        if progress is not None:
+            progress(done, len(pdf_paths), pdf_path)
+        yield sections
+
+
+def _iter_pooled(tasks, max_in_flight):
+    pool = _get_pool()
+    window = deque()
+    for task in tasks:
+        window.append(pool.submit(parse_page_range, *task))
+        if len(window) >= max_in_flight:
+            yield window.popleft().result()
+    while window:
+        yield window.popleft().result()
+
+
+def extract_sections_many(pdf_paths, max_pages=30, progress=None):
+    return list(iter_sections_many(pdf_paths, max_pages, progress))
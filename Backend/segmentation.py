@@ -0,0 +1,113 @@
+# segmentation.py
+#
+# Sentence segmentation and sentence-window chunking for the Semantic
+# Analyzer. Segmenters return (start, end) offsets into the section text;
+# windows are measured on those offsets and only the chunks that survive the
+# per-section cap are ever joined into strings. Sentences are produced lazily,
+# so a long section stops being segmented as soon as the cap is reached.
+#
+# SENTENCE_SEGMENTER=punkt  NLTK Punkt, identical to nltk's sent_tokenize (default)
+# SENTENCE_SEGMENTER=regex  compiled-regex rules, no nltk import or model data;
+#                           segmentation_conformance.py measures it against Punkt
+
+import os
+import re
+
+SENTENCE_SEGMENTER = os.environ.get("SENTENCE_SEGMENTER", "punkt").lower()
+
+# Chunking settings of the Semantic Analyzer, shared with the conformance check
+CHUNK_SENT_WINDOW = 4
+CHUNKS_PER_SECTION_LIMIT = 10
+
+# A candidate break: terminal punctuation plus closing quotes/brackets,
+# followed by whitespace and something that can open a sentence
+_CANDIDATE_BREAK = re.compile(r'[.!?]+["\'’”)\]]*(?=\s+["\'‘“(\[]?[A-Z0-9•])')
+_LAST_TOKEN = re.compile(r'(\S+)$')
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e", "cf", "al",
+    "fig", "figs", "no", "nos", "vol", "vols", "p", "pp", "ch", "sec", "approx", "dept", "est",
+    "inc", "ltd", "co", "corp", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept",
+    "oct", "nov", "dec", "u.s", "u.k", "a.m", "p.m",
+}
+
+_punkt_tokenizer = None
+
+
+def _strip_span(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def punkt_spans(text):
+    global _punkt_tokenizer
+    if _punkt_tokenizer is None:
+        # nltk drags in scipy/pandas; import it on first use, not at app import
+        from nltk.tokenize import PunktTokenizer
+        _punkt_tokenizer = PunktTokenizer("english")
+    return _punkt_tokenizer.span_tokenize(text)
+
+
+def regex_spans(text):
+    start = 0
+    for match in _CANDIDATE_BREAK.finditer(text):
+        if match.start() < start:
+            continue
+        if text[match.start()] == ".":
+            token = _LAST_TOKEN.search(text, start, match.start())
+            word = token.group(1).lower().lstrip("(\"'") if token else ""
+            # Initials ("J. Smith") and known abbreviations do not end a sentence
+            if word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        yield start, match.end()
+        start = match.end()
+        while start < len(text) and text[start].isspace():
+            start += 1
+    if start < len(text):
+        yield start, len(text)
+
+
+SEGMENTERS = {
+    "punkt": punkt_spans,
+    "regex": regex_spans,
+}
+
+
+def sentence_spans(text, segmenter=None):
+    spans = SEGMENTERS[segmenter or SENTENCE_SEGMENTER]
+    for start, end in spans(text):
+        yield _strip_span(text, start, end)
+
+
+def sentence_windows(text, window, limit, min_sentence_chars=20, min_chunk_chars=40, segmenter=None):
+    # Unique chunks of `window` consecutive kept sentences (a kept sentence is
+    # longer than min_sentence_chars), in order, at most `limit` of them. The
+    # last window is the first one that reaches the final sentence.
+    kept = (span for span in sentence_spans(text, segmenter) if span[1] - span[0] > min_sentence_chars)
+    sents = []
+    exhausted = False
+    chunks = []
+    seen = set()
+    i = 0
+    while len(chunks) < limit:
+        # Look one sentence past the window to know whether it is the last one
+        while not exhausted and len(sents) <= i + window:
+            span = next(kept, None)
+            if span is None:
+                exhausted = True
+            else:
+                sents.append(span)
+        if i >= len(sents):
+            break
+        group = sents[i:i + window]
+        if sum(end - start for start, end in group) + len(group) - 1 > min_chunk_chars:
+            chunk = ' '.join(text[start:end] for start, end in group)
+            if chunk not in seen:
+                seen.add(chunk)
+                chunks.append(chunk)
+        if i + window >= len(sents):
+            break
+        i += 1
+    return chunks
@@ -0,0 +1,109 @@
+# segmentation_conformance.py
+#
+# Validates a sentence segmenter against Punkt on a corpus of PDFs before
+# switching SENTENCE_SEGMENTER away from it.
+#
+#   python segmentation_conformance.py /path/to/pdfs [--candidate regex] [--json report.json]
+#
+# Sections are extracted as the Semantic Analyzer extracts them. For every
+# file it reports sentence-boundary precision and recall of the candidate
+# against the reference (a sentence matches on its exact offsets), the share
+# of sections whose chunks come out identical, and the time each segmenter
+# took.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from outline_conformance import collect_pdfs
+from section_extraction import extract_sections
+from segmentation import CHUNK_SENT_WINDOW, CHUNKS_PER_SECTION_LIMIT, SEGMENTERS, sentence_spans, sentence_windows
+
+
+def segment(segmenter, texts):
+    started = time.perf_counter()
+    spans = [set(sentence_spans(text, segmenter)) for text in texts]
+    return spans, time.perf_counter() - started
+
+
+def compare_file(pdf_path, reference, candidate, max_pages):
+    texts = [sec["section_text"] for sec in extract_sections(pdf_path, max_pages=max_pages)]
+    ref_spans, ref_seconds = segment(reference, texts)
+    cand_spans, cand_seconds = segment(candidate, texts)
+    matched = sum(len(r & c) for r, c in zip(ref_spans, cand_spans))
+    n_ref = sum(len(r) for r in ref_spans)
+    n_cand = sum(len(c) for c in cand_spans)
+    same_chunks = sum(
+        sentence_windows(text, CHUNK_SENT_WINDOW, CHUNKS_PER_SECTION_LIMIT, segmenter=reference)
+        == sentence_windows(text, CHUNK_SENT_WINDOW, CHUNKS_PER_SECTION_LIMIT, segmenter=candidate)
+        for text in texts
+    )
+    return {
+        "file": pdf_path,
+        "sections": len(texts),
+        "reference_sentences": n_ref,
+        "candidate_sentences": n_cand,
+        "matched_sentences": matched,
+        "precision": round(matched / n_cand, 4) if n_cand else (1.0 if not n_ref else 0.0),
+        "recall": round(matched / n_ref, 4) if n_ref else (1.0 if not n_cand else 0.0),
+        "identical_chunk_sections": same_chunks,
+        "reference_seconds": round(ref_seconds, 4),
+        "candidate_seconds": round(cand_seconds, 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare sentence segmenters on a PDF corpus.")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--reference", default="punkt", choices=sorted(SEGMENTERS))
+    parser.add_argument("--candidate", default="regex", choices=sorted(SEGMENTERS))
+    parser.add_argument("--max-pages", type=int, default=30, help="Pages per file to read (0 for all)")
+    parser.add_argument("--json", dest="json_path", help="Write the full per-file report to this file")
+    args = parser.parse_args(argv)
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        print("No PDF files found.")
+        return 1
+
+    report = []
+    for pdf_path in pdfs:
+        try:
+            entry = compare_file(pdf_path, args.reference, args.candidate, args.max_pages or None)
+        except Exception as e:
+            print(f"{os.path.basename(pdf_path)}: failed ({e})")
+            report.append({"file": pdf_path, "error": str(e)})
+            continue
+        report.append(entry)
+        print(
+            f"{os.path.basename(pdf_path)}: precision {entry['precision']:.3f}, recall {entry['recall']:.3f}, "
+            f"identical chunks {entry['identical_chunk_sections']}/{entry['sections']} sections, "
+            f"{args.reference} {entry['reference_seconds']:.3f}s, {args.candidate} {entry['candidate_seconds']:.3f}s"
+        )
+
+    compared = [e for e in report if "error" not in e]
+    if compared:
+        matched = sum(e["matched_sentences"] for e in compared)
+        n_ref = sum(e["reference_sentences"] for e in compared)
+        n_cand = sum(e["candidate_sentences"] for e in compared)
+        sections = sum(e["sections"] for e in compared)
+        identical = sum(e["identical_chunk_sections"] for e in compared)
+        ref_seconds = sum(e["reference_seconds"] for e in compared)
+        cand_seconds = sum(e["candidate_seconds"] for e in compared)
+        speedup = ref_seconds / cand_seconds if cand_seconds else float("inf")
+        print(
+            f"\n{len(compared)} files: sentence precision {matched / n_cand if n_cand else 1.0:.3f}, "
+            f"recall {matched / n_ref if n_ref else 1.0:.3f}, identical chunks in {identical}/{sections} sections, "
+            f"{args.candidate} is {speedup:.1f}x faster than {args.reference}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# spatial_index.py
+#
+# Per-page grid index over rectangular page regions (detected tables). A
+# point lookup only inspects the regions registered in the grid cell the
+# point falls into, instead of scanning every region of the document.
+
+import math
+
+DEFAULT_CELL_SIZE = 72.0  # one inch in PDF points
+
+
+class RegionIndex:
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.regions = []
+        self._grids = {}
+
+    @classmethod
+    def from_bboxes(cls, bboxes, cell_size=DEFAULT_CELL_SIZE):
+        index = cls(cell_size)
+        for x0, top, x1, bottom, page in bboxes:
+            index.add(page, x0, top, x1, bottom)
+        return index
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def add(self, page, x0, top, x1, bottom):
+        region_id = len(self.regions)
+        self.regions.append((x0, top, x1, bottom, page))
+        grid = self._grids.setdefault(page, {})
+        for cx in range(self._cell(x0), self._cell(x1) + 1):
+            for cy in range(self._cell(top), self._cell(bottom) + 1):
+                grid.setdefault((cx, cy), []).append(region_id)
+        return region_id
+
+    def region_at(self, page, x, y):
+        # Id of the first region (in insertion order) containing the point, bounds inclusive
+        grid = self._grids.get(page)
+        if not grid:
+            return None
+        for region_id in grid.get((self._cell(x), self._cell(y)), ()):
+            x0, top, x1, bottom, _ = self.regions[region_id]
+            if x0 <= x <= x1 and top <= y <= bottom:
+                return region_id
+        return None
+
+    def contains(self, page, x, y):
+        return self.region_at(page, x, y) is not None
+
+    def page_regions(self, page):
+        return [r for r in self.regions if r[4] == page]
+
+    def __len__(self):
+        return len(self.regions)
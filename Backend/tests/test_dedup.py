@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from dedup import LSH_MIN_RECALL, NearDuplicateIndex, band_recall, lsh_bands
+
+
+@pytest.mark.parametrize("threshold", [0.95, 0.9, 0.8, 0.7, 0.5])
+def test_band_split_finds_pairs_at_the_threshold(threshold):
+    bands = lsh_bands(threshold, 64)
+    assert 64 % bands == 0
+    assert band_recall(threshold, bands, 64 // bands) >= LSH_MIN_RECALL
+    if bands > 1:
+        # The next split with more rows per band would fall short
+        fewer = max(b for b in range(1, bands) if 64 % b == 0)
+        assert band_recall(threshold, fewer, 64 // fewer) < LSH_MIN_RECALL
+
+
+def test_default_threshold_keeps_eight_bands():
+    assert NearDuplicateIndex().bands == 8
+
+
+def shares_band(index, first, second):
+    a, b = index.signature(first), index.signature(second)
+    rows = index.rows
+    return any((a[i * rows:(i + 1) * rows] == b[i * rows:(i + 1) * rows]).all() for i in range(index.bands))
+
+
+def test_pairs_near_point_eight_become_candidates_at_that_threshold():
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(5000)]
+    pairs = []
+    for _ in range(300):
+        words = rng.sample(vocabulary, 120)
+        edited = list(words)
+        # Four spread-out word edits leave a 3-shingle Jaccard similarity near 0.82
+        for position in (10, 40, 70, 100):
+            edited[position] = rng.choice(vocabulary)
+        pairs.append((" ".join(words), " ".join(edited)))
+
+    chosen = NearDuplicateIndex(threshold=0.8)
+    fixed = NearDuplicateIndex(threshold=0.8, bands=8)
+    assert sum(shares_band(chosen, *pair) for pair in pairs) >= 0.97 * len(pairs)
+    assert sum(shares_band(fixed, *pair) for pair in pairs) < 0.9 * len(pairs)
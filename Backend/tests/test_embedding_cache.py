@@ -0,0 +1,53 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 16
+VECTOR_BYTES = DIM * 4
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+
+def test_max_bytes_bounds_a_file_shared_by_several_caches(tmp_path):
+    # Two handles on one file stand in for two worker processes
+    path = str(tmp_path / "embeddings.sqlite3")
+    first = EmbeddingCache(path, "model", max_bytes=10 * VECTOR_BYTES)
+    second = EmbeddingCache(path, "model", max_bytes=10 * VECTOR_BYTES)
+
+    for i in range(6):
+        cache = first if i % 2 else second
+        texts = [f"chunk {i}-{j}" for j in range(4)]
+        cache.put_many(texts, vectors(4, seed=i))
+
+    stats = first.stats()
+    assert stats["entries"] == 10
+    assert stats["size_bytes"] == 10 * VECTOR_BYTES == second.stats()["size_bytes"]
+
+
+def test_replacing_a_vector_keeps_the_byte_total(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), "model")
+    cache.put_many(["a", "b"], vectors(2))
+    cache.put_many(["a"], vectors(1, seed=1))
+
+    assert cache.stats()["size_bytes"] == 2 * VECTOR_BYTES
+    np.testing.assert_array_equal(cache.get_many(["a"])[0], vectors(1, seed=1)[0])
+
+
+def test_recent_hits_survive_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), "model", max_bytes=3 * VECTOR_BYTES)
+    for i, text in enumerate(["old", "mid", "new"]):
+        cache.put_many([text], vectors(1, seed=i))
+    # The hit is only buffered in memory until the next put writes it back
+    assert cache.get_many(["old"])[0] is not None
+    cache.put_many(["newest"], vectors(1, seed=2))
+
+    found = cache.get_many(["old", "mid", "new", "newest"])
+    assert [vector is not None for vector in found] == [True, False, True, True]
+
+
+def test_reopening_counts_existing_rows(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(path, "model").put_many(["a", "b", "c"], vectors(3))
+    assert EmbeddingCache(path, "model").stats()["size_bytes"] == 3 * VECTOR_BYTES
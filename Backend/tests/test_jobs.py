@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+
+from jobs import JobQueue
+
+
+def wait_for(queue, job_id, statuses, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status is not None and status["status"] in statuses:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {statuses}: {queue.status(job_id)}")
+
+
+def echo(params, job_dir, progress):
+    progress(1, 1)
+    return params
+
+
+def test_submitted_job_runs_once_and_keeps_its_result(tmp_path):
+    queue = JobQueue(str(tmp_path), {"echo": echo})
+    queue.start()
+    try:
+        job_id = queue.submit("echo", {"n": 1})["job_id"]
+        assert wait_for(queue, job_id, {"completed"})["progress"] == {"done": 1, "total": 1, "current": None}
+        assert queue.result(job_id) == ("completed", {"n": 1})
+    finally:
+        queue.stop()
+
+
+def test_each_job_is_claimed_by_exactly_one_queue(tmp_path):
+    runs = []
+    lock = threading.Lock()
+
+    def record(params, job_dir, progress):
+        with lock:
+            runs.append(params["n"])
+        time.sleep(0.005)
+        return None
+
+    queues = [JobQueue(str(tmp_path), {"record": record}, workers=3) for _ in range(3)]
+    job_ids = [queues[0].submit("record", {"n": n})["job_id"] for n in range(40)]
+    for queue in queues:
+        queue.start()
+    try:
+        for job_id in job_ids:
+            wait_for(queues[0], job_id, {"completed"})
+    finally:
+        for queue in queues:
+            queue.stop()
+    assert sorted(runs) == list(range(40))
+
+
+def test_opening_another_queue_leaves_live_jobs_running(tmp_path):
+    first = JobQueue(str(tmp_path), {"echo": echo})
+    job_id = first.submit("echo", {})["job_id"]
+    assert first._claim()[0] == job_id
+
+    second = JobQueue(str(tmp_path), {"echo": echo})
+    assert second.status(job_id)["status"] == "running"
+    assert second._claim() is None
+
+
+def test_jobs_of_a_silent_owner_are_queued_again(tmp_path):
+    first = JobQueue(str(tmp_path), {"echo": echo}, stale_seconds=0.05)
+    job_id = first.submit("echo", {})["job_id"]
+    assert first._claim()[0] == job_id
+    time.sleep(0.1)
+
+    second = JobQueue(str(tmp_path), {"echo": echo}, stale_seconds=0.05)
+    assert second.status(job_id)["status"] == "queued"
+    assert second._claim()[0] == job_id
+    # The first owner's late result does not overwrite the new run
+    first._finish(job_id, "completed", result={"stale": True})
+    assert second.status(job_id)["status"] == "running"
+
+
+def test_cancel_queued_job(tmp_path):
+    queue = JobQueue(str(tmp_path), {"echo": echo})
+    job_id = queue.submit("echo", {})["job_id"]
+    assert queue.cancel(job_id)["status"] == "cancelled"
+    assert queue._claim() is None
+    assert queue.cancel("missing") is None
+
+
+def test_cancel_running_job_stops_at_next_progress_report(tmp_path):
+    started = threading.Event()
+
+    def spin(params, job_dir, progress):
+        started.set()
+        for i in range(1000):
+            progress(i, 1000)
+            time.sleep(0.01)
+        return "finished"
+
+    queue = JobQueue(str(tmp_path), {"spin": spin})
+    queue.start()
+    try:
+        job_id = queue.submit("spin", {})["job_id"]
+        assert started.wait(5)
+        assert queue.cancel(job_id)["status"] == "running"
+        wait_for(queue, job_id, {"cancelled"})
+        assert queue.result(job_id) == ("cancelled", None)
+    finally:
+        queue.stop()
+
+
+def test_cancel_running_job_stops_at_a_bare_progress_check(tmp_path):
+    started = threading.Event()
+
+    def spin(params, job_dir, progress):
+        progress(0, 1)
+        started.set()
+        for _ in range(1000):
+            progress()
+            time.sleep(0.01)
+        return "finished"
+
+    queue = JobQueue(str(tmp_path), {"spin": spin})
+    queue.start()
+    try:
+        job_id = queue.submit("spin", {})["job_id"]
+        assert started.wait(5)
+        queue.cancel(job_id)
+        status = wait_for(queue, job_id, {"cancelled"})
+        assert status["progress"] == {"done": 0, "total": 1, "current": None}
+    finally:
+        queue.stop()
+
+
+def stage_input(queue, job_id):
+    os.makedirs(queue.input_dir(job_id))
+    with open(os.path.join(queue.input_dir(job_id), "a.pdf"), "wb") as f:
+        f.write(b"%PDF")
+
+
+def test_inputs_are_deleted_when_a_job_finishes(tmp_path):
+    def fail(params, job_dir, progress):
+        raise RuntimeError("broken")
+
+    queue = JobQueue(str(tmp_path), {"echo": echo, "fail": fail})
+    job_ids = []
+    for kind in ("echo", "fail"):
+        job_id = queue.new_job_dir()
+        stage_input(queue, job_id)
+        job_ids.append(queue.submit(kind, {}, job_id)["job_id"])
+    queue.start()
+    try:
+        for job_id, status in zip(job_ids, ("completed", "failed")):
+            wait_for(queue, job_id, {status})
+            assert not os.path.exists(queue.input_dir(job_id))
+            assert os.path.isdir(queue.job_dir(job_id))
+    finally:
+        queue.stop()
+
+
+def test_inputs_are_deleted_when_a_queued_job_is_cancelled(tmp_path):
+    queue = JobQueue(str(tmp_path), {"echo": echo})
+    job_id = queue.new_job_dir()
+    stage_input(queue, job_id)
+    queue.submit("echo", {}, job_id)
+    queue.cancel(job_id)
+    assert not os.path.exists(queue.input_dir(job_id))
+
+
+def test_stale_owner_does_not_delete_the_new_runs_inputs(tmp_path):
+    first = JobQueue(str(tmp_path), {"echo": echo}, stale_seconds=0.05)
+    job_id = first.new_job_dir()
+    stage_input(first, job_id)
+    first.submit("echo", {}, job_id)
+    assert first._claim()[0] == job_id
+    time.sleep(0.1)
+
+    second = JobQueue(str(tmp_path), {"echo": echo}, stale_seconds=0.05)
+    assert second._claim()[0] == job_id
+    first._finish(job_id, "completed", result={})
+    assert os.path.isdir(second.input_dir(job_id))
+
+
+def test_cleanup_removes_expired_jobs_and_their_files(tmp_path):
+    queue = JobQueue(str(tmp_path), {"echo": echo}, ttl_hours=1)
+    old_id = queue.submit("echo", {})["job_id"]
+    new_id = queue.submit("echo", {})["job_id"]
+    for _ in range(2):
+        job_id, _, _ = queue._claim()
+        queue._finish(job_id, "completed", result={})
+    with queue._lock:
+        queue._conn.execute("UPDATE jobs SET finished_at = ? WHERE job_id = ?", (time.time() - 7200, old_id))
+        queue._conn.commit()
+    assert "expires_at" in queue.status(new_id)
+
+    assert queue.cleanup() == 1
+    assert queue.status(old_id) is None
+    assert not os.path.exists(queue.job_dir(old_id))
+    assert queue.status(new_id)["status"] == "completed"
+    assert os.path.isdir(queue.job_dir(new_id))
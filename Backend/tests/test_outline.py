@@ -0,0 +1,99 @@
+import random
+
+import pytest
+from pdfplumber.utils import chars_to_textmap
+
+from outline import FONT_TOLERANCE, SpanTable, font_runs, group_page_lines
+from parsed_document import STYLE_BOLD, STYLE_ITALIC
+
+
+def merge_spans_by_font(spans):
+    # The line-by-line merge font_runs replaces: a span joins the current run
+    # on the same page, in the same style, within the tolerance of its size
+    merged = []
+    current = None
+    for span in spans:
+        if current is None:
+            current = dict(span)
+            continue
+        same_page = span["page"] == current["page"]
+        close_font = abs(span["size"] - current["size"]) <= FONT_TOLERANCE
+        same_style = span["is_bold"] == current["is_bold"] and span["is_italic"] == current["is_italic"]
+        if same_page and close_font and same_style:
+            current["text"] += " " + span["text"]
+        else:
+            merged.append(current)
+            current = dict(span)
+    if current:
+        merged.append(current)
+    return merged
+
+
+def random_rows(rng, n):
+    rows = []
+    page = 0
+    for i in range(n):
+        page += rng.random() < 0.05
+        size = rng.choice([9.0, 10.0, 10.4, 10.5, 10.6, 11.0, 12.0, 14.0, 16.0]) + rng.choice([0, 0, 0, 0.1, -0.1])
+        style = rng.choice([0, 0, 0, STYLE_BOLD, STYLE_ITALIC, STYLE_BOLD | STYLE_ITALIC])
+        rows.append((f"line {i}", round(size, 1), page, style, 72.0, 10.0 * i))
+    return rows
+
+
+def as_spans(rows):
+    return [
+        {"text": text, "size": size, "page": page, "is_bold": bool(style & STYLE_BOLD),
+         "is_italic": bool(style & STYLE_ITALIC)}
+        for text, size, page, style, _, _ in rows
+    ]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_font_runs_matches_merge_spans_by_font(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng, rng.randint(0, 60))
+    table = SpanTable.from_rows(rows)
+
+    starts = font_runs(table).tolist()
+    ends = starts[1:] + [len(rows)]
+    expected = merge_spans_by_font(as_spans(rows))
+
+    assert [table.run_text(first, end) for first, end in zip(starts, ends)] == [run["text"] for run in expected]
+    assert [rows[first][1] for first in starts] == [run["size"] for run in expected]
+
+
+def test_font_runs_anchor_on_the_first_span_of_a_run():
+    # Each step is within the tolerance, but the drift from the run's first size is not
+    rows = [(f"t{i}", size, 0, 0, 0.0, 0.0) for i, size in enumerate([10.0, 10.3, 10.6, 10.9, 11.2])]
+    assert font_runs(SpanTable.from_rows(rows)).tolist() == [0, 2, 4]
+
+
+def random_chars(rng, n):
+    # Char rows of a few text lines: (text, x0, x1, top, size, font name)
+    chars = []
+    for _ in range(n):
+        top = rng.choice([100.0, 101.5, 103.0, 104.5, 110.0, 130.0, 131.0]) + rng.choice([0, 0, 0.3])
+        x0 = round(rng.uniform(50, 300), 1)
+        width = rng.choice([0.5, 2.0, 5.0])
+        chars.append((rng.choice("ab1.  ﬁ"), x0, x0 + width, top, rng.choice([10.0, 12.0]), rng.choice(["Times", "Times-Bold"])))
+    return chars
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_group_page_lines_matches_pdfplumber(seed):
+    rng = random.Random(seed)
+    chars = random_chars(rng, rng.randint(0, 40))
+    plumber_chars = [
+        {"text": text, "x0": x0, "x1": x1, "top": top, "bottom": top + size, "doctop": top, "upright": True,
+         "size": size, "fontname": font, "width": x1 - x0, "height": size}
+        for text, x0, x1, top, size, font in chars
+    ]
+    expected = chars_to_textmap(plumber_chars).extract_text_lines(strip=True) if chars else []
+
+    lines = group_page_lines(chars)
+
+    assert [text for text, *_ in lines] == [line["text"] for line in expected]
+    assert [(size, font) for _, size, font, _, _ in lines] == [
+        (line["chars"][0]["size"], line["chars"][0]["fontname"]) for line in expected
+    ]
+    assert [(x0, top) for *_, x0, top in lines] == [(line["x0"], line["top"]) for line in expected]
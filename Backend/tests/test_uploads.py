@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+import os
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from uploads import MAX_FIELD_BYTES, read_json_upload
+
+
+def chunked(body, size):
+    async def chunks():
+        for start in range(0, len(body), size):
+            yield body[start:start + size]
+    return chunks()
+
+
+def read(body, temp_dir, size=65536, **kwargs):
+    return asyncio.run(read_json_upload(chunked(body, size), str(temp_dir), **kwargs))
+
+
+def pdf_bytes(n, seed=0):
+    rng = random.Random(seed)
+    return b"%PDF-1.4\n" + bytes(rng.randrange(256) for _ in range(n))
+
+
+def mime_base64(data):
+    # 76-char lines, so the JSON string carries "\n" escapes between quads
+    encoded = base64.b64encode(data).decode("ascii")
+    return "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 13, 64, 4096])
+def test_chunk_boundaries_inside_escapes_and_base64_quads(tmp_path, size):
+    first, second = pdf_bytes(1000, seed=1), pdf_bytes(257, seed=2)
+    body = json.dumps({
+        "persona": 'Café "quoted" \\ owner \U0001F600',
+        "job": "tab\there",
+        "doc_ids": ["a", "b"],
+        "files": [
+            {"filename": "first.pdf", "content": mime_base64(first)},
+            {"content": base64.b64encode(second).decode("ascii"), "filename": "second.pdf", "extra": {"x": [1, None]}},
+        ],
+        "full_document": True,
+    }, ensure_ascii=True)
+    # Some encoders escape "/" as well; it must decode to the same bytes
+    body = body.replace("/", "\\/").encode("ascii")
+
+    fields = read(body, tmp_path, size)
+
+    assert fields["persona"] == 'Café "quoted" \\ owner \U0001F600'
+    assert fields["job"] == "tab\there"
+    assert fields["doc_ids"] == ["a", "b"]
+    assert fields["full_document"] is True
+    assert fields["files_count"] == 2
+    assert [os.path.basename(p) for p in fields["pdf_paths"]] == ["first.pdf", "second.pdf"]
+    with open(fields["pdf_paths"][0], "rb") as f:
+        assert f.read() == first
+    with open(fields["pdf_paths"][1], "rb") as f:
+        assert f.read() == second
+
+
+def test_non_pdf_files_are_counted_but_not_kept(tmp_path):
+    body = json.dumps({"files": [{"filename": "notes.txt", "content": base64.b64encode(b"hello").decode()}]})
+    fields = read(body.encode(), tmp_path, 3)
+    assert fields["files_count"] == 1
+    assert fields["pdf_paths"] == []
+    assert not any(name.endswith(".txt") for name in os.listdir(tmp_path))
+
+
+def test_file_over_the_size_limit_is_rejected(tmp_path):
+    data = pdf_bytes(2048)
+    body = json.dumps({"files": [{"filename": "big.pdf", "content": base64.b64encode(data).decode()}]}).encode()
+    assert read(body, tmp_path, 7, max_bytes=len(data))["files_count"] == 1
+    with pytest.raises(HTTPException) as e:
+        read(body, tmp_path, 7, max_bytes=len(data) - 1)
+    assert e.value.status_code == 413
+
+
+def test_field_over_the_size_limit_is_rejected(tmp_path):
+    body = json.dumps({"persona": "p" * (MAX_FIELD_BYTES + 1), "job": "j"}).encode()
+    with pytest.raises(HTTPException) as e:
+        read(body, tmp_path)
+    assert e.value.status_code == 413
+
+
+@pytest.mark.parametrize("body", [b"", b"[]", b'{"persona": "x"', b'{"persona": "\\q"}', b'{"files": [{"content": 5}'])
+def test_malformed_bodies_are_bad_requests(tmp_path, body):
+    with pytest.raises(HTTPException) as e:
+        read(body, tmp_path, 2)
+    assert e.value.status_code == 400
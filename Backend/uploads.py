@@ -0,0 +1,308 @@
+# uploads.py
+#
+# Bounded-memory ingestion of uploaded PDFs. Multipart files are copied to
+# disk in fixed-size blocks, and the base64 JSON payload of
+# /semantic/process-pdfs-json is parsed incrementally straight off the
+# request stream, decoding each file's content to disk as it arrives. Both
+# paths enforce MAX_FILE_SIZE_MB per file.
+
+import binascii
+import json
+import os
+import re
+
+from fastapi import HTTPException
+from werkzeug.utils import secure_filename
+
+MAX_FILE_SIZE_MB = int(os.environ.get("MAX_FILE_SIZE_MB", 50))
+MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+COPY_BLOCK_SIZE = 1024 * 1024
+MAX_FIELD_BYTES = 1024 * 1024
+
+_WHITESPACE = b" \t\r\n"
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_SIMPLE_ESCAPES = {
+    ord('"'): b'"', ord('\\'): b'\\', ord('/'): b'/', ord('b'): b'\b',
+    ord('f'): b'\f', ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t',
+}
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_NON_BASE64 = bytes(b for b in range(256) if b not in _BASE64_ALPHABET)
+
+
+def file_too_large(filename):
+    return HTTPException(
+        status_code=413,
+        detail=f"File {filename} exceeds the {MAX_FILE_SIZE_MB} MB upload limit.",
+    )
+
+
+async def save_upload(upload, dest_path, max_bytes=MAX_FILE_SIZE_BYTES):
+    if upload.size is not None and upload.size > max_bytes:
+        raise file_too_large(upload.filename)
+    written = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            block = await upload.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if written > max_bytes:
+                break
+            out.write(block)
+    if written > max_bytes:
+        os.remove(dest_path)
+        raise file_too_large(upload.filename)
+    return written
+
+
+class _Base64FileSink:
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.written = 0
+        self._pending = b""
+        self._out = open(path, "wb")
+
+    def write(self, data):
+        # Like base64.b64decode(validate=False): characters outside the
+        # alphabet are dropped, the rest is decoded in whole 4-char groups
+        data = self._pending + data.translate(None, _NON_BASE64)
+        cut = len(data) - len(data) % 4
+        self._pending = data[cut:]
+        if cut:
+            self._emit(binascii.a2b_base64(data[:cut]))
+
+    def close(self):
+        try:
+            if self._pending:
+                self._emit(binascii.a2b_base64(self._pending))
+        finally:
+            self._out.close()
+
+    def _emit(self, decoded):
+        self.written += len(decoded)
+        if self.written > self.max_bytes:
+            raise OverflowError
+        self._out.write(decoded)
+
+
+class _JsonStreamReader:
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+        self._buf = b""
+        self._pos = 0
+
+    async def _fill(self):
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    async def _ensure(self, n):
+        while len(self._buf) - self._pos < n:
+            if not await self._fill():
+                raise ValueError("Unexpected end of JSON body")
+
+    async def peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not await self._fill():
+                return None
+
+    async def expect(self, char):
+        if await self.peek() != ord(char):
+            raise ValueError(f"Expected '{char}' in JSON body")
+        self._pos += 1
+
+    async def consume_if(self, char):
+        if await self.peek() == ord(char):
+            self._pos += 1
+            return True
+        return False
+
+    async def _read_escape(self):
+        await self._ensure(1)
+        code = self._buf[self._pos]
+        self._pos += 1
+        if code in _SIMPLE_ESCAPES:
+            return _SIMPLE_ESCAPES[code]
+        if code != ord('u'):
+            raise ValueError("Invalid escape in JSON string")
+        await self._ensure(4)
+        point = int(self._buf[self._pos:self._pos + 4], 16)
+        self._pos += 4
+        if 0xD800 <= point < 0xDC00:
+            await self._ensure(6)
+            if self._buf[self._pos:self._pos + 2] == b"\\u":
+                low = int(self._buf[self._pos + 2:self._pos + 6], 16)
+                if 0xDC00 <= low < 0xE000:
+                    self._pos += 6
+                    point = 0x10000 + ((point - 0xD800) << 10) + (low - 0xDC00)
+        return chr(point).encode("utf-8", "surrogatepass")
+
+    async def read_string(self, sink):
+        await self.expect('"')
+        while True:
+            match = _STRING_SPECIAL.search(self._buf, self._pos)
+            if match is None:
+                if self._pos < len(self._buf):
+                    sink(self._buf[self._pos:])
+                self._pos = len(self._buf)
+                if not await self._fill():
+                    raise ValueError("Unterminated string in JSON body")
+                continue
+            end = match.start()
+            if end > self._pos:
+                sink(self._buf[self._pos:end])
+            self._pos = end + 1
+            if self._buf[end] == ord('"'):
+                return
+            sink(await self._read_escape())
+
+    async def read_small_string(self, limit=MAX_FIELD_BYTES):
+        parts = bytearray()
+
+        def sink(data):
+            parts.extend(data)
+            if len(parts) > limit:
+                raise HTTPException(status_code=413, detail="JSON field too large")
+
+        await self.read_string(sink)
+        return parts.decode("utf-8", "replace")
+
+    async def skip_value(self):
+        head = await self.peek()
+        if head == ord('"'):
+            await self.read_string(lambda data: None)
+        elif head in (ord('{'), ord('[')):
+            closing = '}' if head == ord('{') else ']'
+            self._pos += 1
+            if await self.consume_if(closing):
+                return
+            while True:
+                if closing == '}':
+                    await self.read_string(lambda data: None)
+                    await self.expect(':')
+                await self.skip_value()
+                if not await self.consume_if(','):
+                    await self.expect(closing)
+                    return
+        else:
+            await self.read_scalar()
+
+    async def read_scalar(self):
+        # number, true, false or null
+        if await self.peek() is None:
+            raise ValueError("Unexpected end of JSON body")
+        token = bytearray()
+        while True:
+            start = self._pos
+            while self._pos < len(self._buf) and self._buf[self._pos] not in b",]} \t\r\n":
+                self._pos += 1
+            token.extend(self._buf[start:self._pos])
+            if len(token) > MAX_FIELD_BYTES:
+                raise ValueError("JSON value too large")
+            if self._pos < len(self._buf) or not await self._fill():
+                return json.loads(bytes(token))
+
+    async def read_any(self):
+        # Small scalar/array values such as persona, job and doc_ids
+        head = await self.peek()
+        if head == ord('"'):
+            return await self.read_small_string()
+        if head == ord('['):
+            self._pos += 1
+            items = []
+            if await self.consume_if(']'):
+                return items
+            while True:
+                items.append(await self.read_any())
+                if not await self.consume_if(','):
+                    await self.expect(']')
+                    return items
+        if head == ord('{'):
+            await self.skip_value()
+            return None
+        return await self.read_scalar()
+
+
+async def _read_file_entry(reader, temp_dir, index, max_bytes):
+    staging_path = os.path.join(temp_dir, f".upload-{index}")
+    filename = "document.pdf"
+    sink = None
+    await reader.expect('{')
+    try:
+        if not await reader.consume_if('}'):
+            while True:
+                key = await reader.read_small_string()
+                await reader.expect(':')
+                if key == "filename":
+                    filename = await reader.read_any()
+                elif key == "content" and await reader.peek() == ord('"'):
+                    sink = _Base64FileSink(staging_path, max_bytes)
+                    try:
+                        await reader.read_string(sink.write)
+                    finally:
+                        sink.close()
+                else:
+                    await reader.skip_value()
+                if not await reader.consume_if(','):
+                    await reader.expect('}')
+                    break
+    except OverflowError:
+        raise file_too_large(filename)
+    except binascii.Error as e:
+        raise HTTPException(status_code=400, detail=f"Failed to decode file {secure_filename(str(filename))}: {str(e)}")
+
+    filename = secure_filename(str(filename))
+    if not filename.lower().endswith(".pdf"):
+        if sink is not None:
+            os.remove(staging_path)
+        return None
+    file_path = os.path.join(temp_dir, filename)
+    if sink is None:
+        open(file_path, "wb").close()
+    else:
+        os.replace(staging_path, file_path)
+    return file_path
+
+
+async def read_json_upload(chunks, temp_dir, max_bytes=MAX_FILE_SIZE_BYTES):
+    # Returns the scalar fields of the body plus "pdf_paths" for the decoded
+    # files; file contents never sit in memory as a whole.
+    reader = _JsonStreamReader(chunks)
+    fields = {"pdf_paths": [], "files_count": 0}
+    try:
+        await reader.expect('{')
+        if await reader.consume_if('}'):
+            return fields
+        while True:
+            key = await reader.read_small_string()
+            await reader.expect(':')
+            if key == "files" and await reader.peek() == ord('['):
+                await reader.expect('[')
+                if not await reader.consume_if(']'):
+                    while True:
+                        path = await _read_file_entry(reader, temp_dir, fields["files_count"], max_bytes)
+                        fields["files_count"] += 1
+                        if path:
+                            fields["pdf_paths"].append(path)
+                        if not await reader.consume_if(','):
+                            await reader.expect(']')
+                            break
+            elif key in ("persona", "job", "doc_ids", "full_document"):
+                fields[key] = await reader.read_any()
+            else:
+                await reader.skip_value()
+            if not await reader.consume_if(','):
+                await reader.expect('}')
+                break
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed JSON body: {str(e)}")
+    return fields